@@ -27,6 +27,20 @@ def is_valid_position(p):
     return all(0 <= x < BOARD_LENGTH for x in p)
 
 
+def _explosion_radius(pos):
+    """ Computes the positions in the explosion radius of pos (including pos)"""
+    x, y = pos
+    possible = itertools.product(
+        range(x - EXPLOSION_RADIUS, x + EXPLOSION_RADIUS + 1),
+        range(y - EXPLOSION_RADIUS, y + EXPLOSION_RADIUS + 1))
+
+    return frozenset(p for p in possible if is_valid_position(p))
+
+
+#the explosion radius of every board position, computed once on import
+_EXPLOSION_RADII = {p: _explosion_radius(p) for p in positions()}
+
+
 def in_explosion_radius(p1, p2):
     """ Checks whether two positions are in the same explosion radius
 
@@ -37,25 +51,20 @@ def in_explosion_radius(p1, p2):
             True if p1 and p2 are in each-others explosion radius and false
             otherwise
     """
-    return all(abs(x - y) <= EXPLOSION_RADIUS for x, y in zip(p1, p2))
+    return p2 in _EXPLOSION_RADII[p1]
 
 
 def explosion_radius(pos):
-    """ Returns an iterable of positions which are in the explosion radius of
-        an explosion centered on pos.
+    """ Returns the positions which are in the explosion radius of an 
+        explosion centered on pos.
 
         Args:
             pos: A valid board position, the center of the explosion.
 
-        Yields:
-            Valid board positions in the explosion radius of pos
+        Returns:
+            A frozenset of valid board positions in the explosion radius of pos
     """
-    x, y = pos
-    possible = itertools.product(
-        range(x - EXPLOSION_RADIUS, x + EXPLOSION_RADIUS + 1),
-        range(y - EXPLOSION_RADIUS, y + EXPLOSION_RADIUS + 1))
-
-    return (p for p in possible if is_valid_position(p))
+    return _EXPLOSION_RADII[pos]
 
 
 def explosion_radii(ps):
@@ -136,7 +136,7 @@ class State:
             exploded.add(exploder)
 
             #look at white tokens in the explosion radius radius
-            radius = set(board.explosion_radius(exploder))
+            radius = board.explosion_radius(exploder)
             for w in self.white:
                 if w.pos in radius and w.pos not in exploded:
                     white_to_explode.add(w.pos)
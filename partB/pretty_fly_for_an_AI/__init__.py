@@ -4,6 +4,15 @@ from pretty_fly_for_an_AI.player import Player
 #this is our version of player to use for machine learning 
 from pretty_fly_for_an_AI.player import LearnerPlayer
 
+#same as Player but using the bitboard engine
+from pretty_fly_for_an_AI.player import BitboardPlayer
+
+#same as Player but with late move reductions and futility pruning
+from pretty_fly_for_an_AI.player import PrunedPlayer
+
+#same as Player but searching with a worker process per core
+from pretty_fly_for_an_AI.player import ParallelPlayer
+
 #we can import other players to compare. 
 # use pretty_fly_for_an_AI:OtherPlayer as an argument to referee
 from pretty_fly_for_an_AI.old_players import RandomPlayer 
@@ -0,0 +1,220 @@
+""" Benchmarks the search functions in minimax.py on a fixed set of positions.
+
+    Run from the partB directory with:
+        python3 -m pretty_fly_for_an_AI.benchmark
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from pretty_fly_for_an_AI import state as st
+from pretty_fly_for_an_AI import bitboard
+from pretty_fly_for_an_AI import minimax
+from pretty_fly_for_an_AI.evaluation import reward, reward_batch, reward_totals, IncrementalReward
+from pretty_fly_for_an_AI.transposition import TranspositionTable
+from pretty_fly_for_an_AI.ordering import MoveOrdering
+from pretty_fly_for_an_AI.reuse import SearchMemory
+from pretty_fly_for_an_AI.parallel import ParallelSearch
+
+WEIGHTS = "./pretty_fly_for_an_AI/weights_learned_w.npy"
+
+# the transposition table and move ordering used by the "tt", "ordered",
+# "quiesce", "mtdf" and pruned searches. They are cleared before benchmarking each search, and kept between
+# positions as they are between moves in a game
+TABLE = TranspositionTable()
+ORDERING = MoveOrdering()
+
+# the score kept between searches by the "aspiration" search, also cleared
+# before benchmarking. Its windows are centred on the previous search, so it is 
+# best compared with "pvs" using --deepen
+ASPIRATION = minimax.Aspiration()
+
+# the memory kept between searches by the "reuse" search, also cleared before
+# benchmarking. It is best compared with "learned" using --deepen
+MEMORY = SearchMemory()
+
+# the searches which can be benchmarked. Each is a callable
+# search(state, depth, ev, prev_states) which returns a move
+SEARCHES = {
+    "learned": minimax.alpha_beta_search_learned,
+    "bitboard": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_learned(
+        bitboard.from_array(s), depth, BITBOARD_EV, prev_states, engine=bitboard),
+    "bitboard-array": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_learned(
+        bitboard.from_array(s), depth, lambda b: ev(bitboard.to_array(b)), prev_states, engine=bitboard),
+    "reuse": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_learned(
+        s, depth, ev, prev_states, memory=MEMORY),
+    "inplace": minimax.alpha_beta_search_inplace,
+    "batched": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_inplace(
+        s, depth, ev, prev_states, BATCH_EV),
+    "incremental": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_inplace(
+        s, depth, INCREMENTAL, prev_states, incremental=INCREMENTAL),
+    "tt": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_tt(
+        s, depth, ev, prev_states, TABLE),
+    "ordered": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_tt(
+        s, depth, ev, prev_states, TABLE, ORDERING),
+    "quiesce": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_tt(
+        s, depth, ev, prev_states, TABLE, ORDERING, quiesce=True),
+    "reduced": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_tt(
+        s, depth, ev, prev_states, TABLE, ORDERING, quiesce=True, reductions=True),
+    "futility": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_tt(
+        s, depth, ev, prev_states, TABLE, ORDERING, quiesce=True, futility=True),
+    "pruned": lambda s, depth, ev, prev_states: minimax.alpha_beta_search_tt(
+        s, depth, ev, prev_states, TABLE, ORDERING, quiesce=True, reductions=True, futility=True),
+    "parallel": lambda s, depth, ev, prev_states: PARALLEL.search(s, depth, ev, prev_states),
+    "mtdf": lambda s, depth, ev, prev_states: minimax.mtdf(s, depth, ev, prev_states, TABLE, ORDERING),
+    "mtdf-quiesce": lambda s, depth, ev, prev_states: minimax.mtdf(
+        s, depth, ev, prev_states, TABLE, ORDERING, quiesce=True),
+    "pvs": minimax.principle_variation_search,
+    "aspiration": lambda s, depth, ev, prev_states: minimax.principle_variation_search(
+        s, depth, ev, prev_states, ASPIRATION),
+}
+
+# the batched evaluation function used by the "batched" search, the 
+# incremental evaluation used by the "incremental" search and the evaluation 
+# of bitboards used by the "bitboard" search, created in main. The leaves they
+# score are not counted. The "bitboard-array" search converts each leaf back to
+# a board array instead, as the bitboard engine used to
+BATCH_EV = None
+INCREMENTAL = None
+BITBOARD_EV = None
+
+# the ParallelSearch used by the "parallel" search, created in main. The
+# workers do not use the benchmark's evaluation function, so their leaves are
+# not counted
+PARALLEL = None
+
+
+def opening_positions(num_positions, plies, seed=0):
+    """ Generates the standard benchmark positions by playing random moves
+        from the starting position.
+
+        Args:
+            num_positions: the number of positions to generate
+            plies: the number of random moves made from the start position
+            seed: the random seed
+
+        Returns:
+            A list of board states, each with the player (white) to move.
+    """
+    rng = random.Random(seed)
+
+    positions = []
+    while len(positions) < num_positions:
+        s = st.create_start_state(st.WHITE_COLOR)
+        for ply in range(2 * (plies // 2)):
+            children = [child for _, child in st.next_states(s, ply % 2 == 1)]
+            s = rng.choice(children)
+            if st.is_gameover(s):
+                break
+        else:
+            positions.append(s)
+    return positions
+
+
+def run(search, positions, depth, ev, deepen=False):
+    """ Runs search on each position. If deepen is True every depth from 1 to
+        depth is searched in turn, as in iterative deepening.
+
+        Returns:
+            A tuple (moves, leaves, boards, seconds, wall) where moves is the 
+            list of moves found, leaves the number of evaluated leaves, boards
+            the number of new boards created by state.move and state.boom, 
+            seconds the total CPU time taken and wall the wall clock time.
+    """
+    leaves = 0
+    boards = 0
+
+    def counting_ev(s):
+        nonlocal leaves
+        leaves += 1
+        return ev(s)
+
+    def counting(f):
+        def g(*args):
+            nonlocal boards
+            boards += 1
+            return f(*args)
+        return g
+
+    # count the boards allocated by the search (every boom creates its board
+    # with state._clear)
+    move, clear = st.move, st._clear
+    st.move, st._clear = counting(move), counting(clear)
+
+    moves = []
+    t0 = time.process_time()
+    w0 = time.perf_counter()
+    try:
+        for s in positions:
+            for d in range(1 if deepen else depth, depth + 1):
+                best = search(s, d, counting_ev, set())
+            moves.append(best)
+    finally:
+        st.move, st._clear = move, clear
+    seconds = time.process_time() - t0
+    wall = time.perf_counter() - w0
+
+    return moves, leaves, boards, seconds, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search functions.")
+    parser.add_argument("searches", nargs="*",
+                        help=f"The searches to benchmark, from {', '.join(SEARCHES)} (default all).")
+    parser.add_argument("--depth", "-d", type=int, default=3, help="The search depth.")
+    parser.add_argument("--positions", "-n", type=int, default=10, help="The number of positions.")
+    parser.add_argument("--plies", "-p", type=int, default=10,
+                        help="The number of random moves used to create each position.")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="The random seed for the positions.")
+    parser.add_argument("--deepen", action="store_true",
+                        help="Search every depth up to the search depth, as in iterative deepening.")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="The number of workers used by the parallel search (default one per core).")
+    args = parser.parse_args()
+
+    for name in args.searches:
+        if name not in SEARCHES:
+            parser.error(f"unknown search: {name}")
+
+    weights = np.load(WEIGHTS)
+    ev = lambda s: reward(s, weights)
+    positions = opening_positions(args.positions, args.plies, args.seed)
+
+    global PARALLEL, BATCH_EV, INCREMENTAL, BITBOARD_EV
+    BATCH_EV = lambda boards: reward_batch(boards, weights)
+    INCREMENTAL = IncrementalReward(weights)
+    BITBOARD_EV = lambda b: reward_totals(bitboard.totals(b), weights)
+    searches = args.searches or list(SEARCHES)
+    if "parallel" in searches:
+        PARALLEL = ParallelSearch(weights, args.workers, quiesce=True)
+
+    walls = {}
+    for name in searches:
+        TABLE.clear()
+        TABLE.reset_stats()
+        ORDERING.clear()
+        ASPIRATION.clear()
+        MEMORY.clear()
+
+        moves, leaves, boards, seconds, walls[name] = run(SEARCHES[name], positions, args.depth, ev,
+                                                          args.deepen)
+        rate = leaves / seconds if seconds else 0.0
+        print(f"{name:>12}: {leaves:8d} leaves {boards:8d} boards {seconds:8.3f}s "
+              f"{rate:9.1f} leaves/s {walls[name]:8.3f}s wall")
+
+        if TABLE.probes:
+            stats = TABLE.stats()
+            print(f"{'':>12}  {stats['hit_rate']:.1%} hit rate, {stats['collisions']} collisions, "
+                  f"{stats['occupancy']:.1%} of {stats['size']} slots ({stats['bytes'] / 1024 ** 2:.1f}MB) used")
+
+    if "parallel" in walls and "quiesce" in walls:
+        print(f"{'':>12}  parallel speedup {walls['quiesce'] / walls['parallel']:.2f}x "
+              f"with {PARALLEL.workers} workers")
+    if PARALLEL is not None:
+        PARALLEL.close()
+
+
+if __name__ == "__main__":
+    main()
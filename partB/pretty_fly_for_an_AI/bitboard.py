@@ -0,0 +1,350 @@
+""" An alternative board engine to state.py using bit operations on Python
+    integers instead of numpy arrays.
+
+    A board is a tuple (ours, theirs, heights) where:
+        ours: a 64 bit occupancy mask of the players stacks. Bit i is set iff
+        board index i contains one of the players stacks.
+        theirs: a 64 bit occupancy mask of the opponents stacks.
+        heights: the stack heights packed into a single integer, HEIGHT_BITS
+        bits per board index. The height at board index i is
+        (heights >> (HEIGHT_BITS * i)) & HEIGHT_MASK.
+
+    Board indexes, move ordering and action codes are identical to state.py so
+    the two engines can be used interchangeably by the search.
+"""
+
+import numpy as np
+
+from pretty_fly_for_an_AI import state as st
+from pretty_fly_for_an_AI import geometry
+
+# number of bits used to store each stack height (max height is 12)
+HEIGHT_BITS = 4
+HEIGHT_MASK = (1 << HEIGHT_BITS) - 1
+
+
+# precomputed geometry
+NEAR_MASKS = geometry.NEAR_MASKS
+MOVE_RAYS = geometry.MOVE_RAYS
+MOVE_RAYS_END = geometry.MOVE_RAYS_END
+
+# masks of the squares whose x (or y) coordinate has bit k set, so the sum of 
+# the x coordinates of the squares in a mask m is the sum over k of
+# popcount(m & X_BIT_MASKS[k]) << k
+X_BIT_MASKS = tuple(geometry._mask(i for i in range(geometry.BOARD_SQUARES) if geometry.ITOP[i][0] >> k & 1)
+                    for k in range(3))
+Y_BIT_MASKS = tuple(geometry._mask(i for i in range(geometry.BOARD_SQUARES) if geometry.ITOP[i][1] >> k & 1)
+                    for k in range(3))
+
+# the height mask of every board index whose bit is set in a byte, used to
+# spread an occupancy mask over the heights a byte at a time
+SPREAD = tuple(sum(HEIGHT_MASK << (HEIGHT_BITS * j) for j in range(8) if byte >> j & 1) for byte in range(256))
+
+# the height mask of every second board index. The heights under it are 
+# bytes, and since 256 % 255 == 1 their sum (at most 24) is the packed integer
+# modulo 255
+EVEN_HEIGHTS = sum(HEIGHT_MASK << (2 * HEIGHT_BITS * j) for j in range(32))
+
+
+def height(b, i):
+    """ The (unsigned) height of the stack at board index i """
+    return (b[2] >> (HEIGHT_BITS * i)) & HEIGHT_MASK
+
+
+def from_array(s):
+    """ Converts a state.py board to a bitboard """
+    ours = theirs = heights = 0
+    for i in np.flatnonzero(s):
+        i = int(i)
+        h = int(s[i])
+        if h > 0:
+            ours |= 1 << i
+        else:
+            theirs |= 1 << i
+        heights |= abs(h) << (HEIGHT_BITS * i)
+    return ours, theirs, heights
+
+
+def to_array(b):
+    """ Converts a bitboard to a state.py board """
+    ours, theirs, _ = b
+    s = st.BOARD_EMPTY.copy()
+    for i in geometry.mask_indexes(ours):
+        s[i] = height(b, i)
+    for i in geometry.mask_indexes(theirs):
+        s[i] = -height(b, i)
+    return s
+
+
+def _popcount(mask):
+    return bin(mask).count("1")
+
+
+def _spread(mask):
+    """ The height mask of every board index in an occupancy mask """
+    spread = 0
+    for k in range(8):
+        spread |= SPREAD[(mask >> (8 * k)) & 255] << (8 * HEIGHT_BITS * k)
+    return spread
+
+
+def totals(b):
+    """ The totals of b used by the evaluation function, the same as 
+        evaluation.totals(to_array(b)), computed with masks and popcounts 
+        instead of from every square """
+    ours, theirs, heights = b
+
+    tokens = (heights & EVEN_HEIGHTS) % 255 + ((heights >> HEIGHT_BITS) & EVEN_HEIGHTS) % 255
+    # each player has at most 12 tokens, and 16 % 15 == 1
+    our_sum = (heights & _spread(ours)) % 15
+
+    return (our_sum, our_sum - tokens, _popcount(ours), _popcount(theirs),
+            sum(_popcount(ours & m) << k for k, m in enumerate(X_BIT_MASKS)),
+            sum(_popcount(ours & m) << k for k, m in enumerate(Y_BIT_MASKS)),
+            sum(_popcount(theirs & m) << k for k, m in enumerate(X_BIT_MASKS)),
+            sum(_popcount(theirs & m) << k for k, m in enumerate(Y_BIT_MASKS)))
+
+
+def create_start_state(color):
+    """ Creates the starting board state.
+
+        Args:
+            color: the color of the player (either BLACK_COLOR or WHITE_COLOR)
+
+        Returns:
+            A bitboard
+    """
+    return from_array(st.create_start_state(color))
+
+
+def key(b, opponent=False):
+    """ A hashable identifier of b, used for repeated state checking
+
+        Args:
+            b: the bitboard
+            opponent: set to True if it is the opponents turn to move
+    """
+    return b, opponent
+
+
+def num_stacks(b):
+    """ The number of occupied board indexes """
+    return bin(b[0] | b[1]).count("1")
+
+
+def is_gameover(b):
+    return b[0] == 0 or b[1] == 0
+
+
+def move(b, num_tokens, si, ei, opponent):
+    """ Returns a new bitboard which is the result of applying move.
+
+        No validation is done. May not throw an error if move is invalid.
+
+        Args:
+            b: the bitboard
+            num_tokens: the number of tokens being moved.
+            si: the starting board index of the move
+            ei: the ending board index of the move
+            opponent: set to True if the oponent is making the move
+
+        Returns:
+            A new bitboard which is the result of executing the move.
+    """
+    ours, theirs, heights = b
+
+    heights += (num_tokens << (HEIGHT_BITS * ei)) - (num_tokens << (HEIGHT_BITS * si))
+
+    # the start index is only vacated if the whole stack moved
+    vacated = 0 if (heights >> (HEIGHT_BITS * si)) & HEIGHT_MASK else 1 << si
+
+    if opponent:
+        theirs = (theirs & ~vacated) | (1 << ei)
+    else:
+        ours = (ours & ~vacated) | (1 << ei)
+
+    return ours, theirs, heights
+
+
+def boom_mask(b, i):
+    """ Finds the board indexes removed by an explosion at board index i.
+
+        Args:
+            b: the bitboard
+            i: the board index at which to boom
+
+        Returns:
+            An occupancy mask of every board index cleared by the explosion
+            (including chain reactions).
+    """
+    return st.explosion_components(b[0] | b[1])[i][0]
+
+
+def boom(b, i):
+    """ Returns a new bitboard which is the result of the token at board index
+        i exploding.
+
+        No validation is done. May not throw an error if the move is invalid.
+
+        Args:
+            b: the bitboard
+            i: the board index at which to boom
+
+        Returns:
+            A new bitboard which is the result of executing the boom.
+    """
+    ours, theirs, heights = b
+
+    cleared, idxs, _ = st.explosion_components(ours | theirs)[i]
+    for j in idxs:
+        heights &= ~(HEIGHT_MASK << (HEIGHT_BITS * j))
+
+    return ours & ~cleared, theirs & ~cleared, heights
+
+
+def apply_action(b, action, opponent):
+    """ Returns the new bitboard which is the result of an action.
+
+        Args:
+            b: the bitboard
+            action: an action code (see state.action_code)
+            opponent: set to True if the opponent is making the move.
+    """
+    num_tokens, si, ei = action >> 12, (action >> 6) & 63, action & 63
+    if num_tokens == 0:
+        return boom(b, si)
+    return move(b, num_tokens, si, ei, opponent)
+
+
+def _next_actions(b, opponent, avoid, rays, tokens):
+    """ Shared implementation of next_actions and next_actions_end (see
+        _next_states) """
+    ours, theirs, _ = b
+    if opponent:
+        ours, theirs = theirs, ours
+
+    stacks = geometry.mask_indexes(ours)
+
+    # All booms generated first
+    for si in stacks:
+        if NEAR_MASKS[si] & theirs:
+            yield st.boom_code(si)
+
+    # All moves generated next
+    for si in stacks:
+
+        h = height(b, si)
+
+        for to_i in rays[si][h]:
+            # checks if to_i is either empty or the same color as si
+            if not (theirs >> to_i) & 1:
+
+                for n in tokens(h):
+
+                    if not avoid or key(move(b, n, si, to_i, opponent), not opponent) not in avoid:
+                        yield st.move_code(n, si, to_i)
+
+
+def next_actions(b, opponent, avoid=dict()):
+    """ A generator for the valid actions from this state, as in 
+        state.next_actions (see apply_action).
+
+        Args:
+            b: the bitboard
+            opponent: set to True if the opponent is making the move.
+            avoid: a container of keys (see key) of states not to generate
+
+        Yields:
+            action codes (see state.action_code)
+    """
+    return _next_actions(b, opponent, avoid, MOVE_RAYS, lambda h: range(1, h + 1))
+
+
+def next_actions_end(b, opponent, avoid=dict()):
+    """ The same as next_actions using the end game move ordering (see 
+        state.next_actions_end) """
+    return _next_actions(b, opponent, avoid, MOVE_RAYS_END, lambda h: range(h, 0, -1))
+
+
+def _next_states(b, opponent, avoid, rays, tokens):
+    """ Shared implementation of next_states and next_states_end.
+
+        Args:
+            b: the bitboard
+            opponent: set to True if the opponent is making the move.
+            avoid: a container of keys of states which are not to be generated
+            rays: the move position table to use
+            tokens: a callable tokens(height) giving the order to try moving
+            tokens in
+
+        Yields:
+            tuples of the form (action, state), as in state.next_states.
+    """
+    ours, theirs, _ = b
+    if opponent:
+        ours, theirs = theirs, ours
+
+    stacks = geometry.mask_indexes(ours)
+
+    # All booms generated first
+    for si in stacks:
+        if NEAR_MASKS[si] & theirs:
+            yield st.boom_code(si), boom(b, si)
+
+    # All moves generated next
+    for si in stacks:
+
+        h = height(b, si)
+
+        for to_i in rays[si][h]:
+            # checks if to_i is either empty or the same color as si
+            if not (theirs >> to_i) & 1:
+
+                for n in tokens(h):
+
+                    next_state = move(b, n, si, to_i, opponent)
+                    if not avoid or key(next_state, not opponent) not in avoid:
+                        yield st.move_code(n, si, to_i), next_state
+
+
+def next_states(b, opponent, avoid=dict()):
+    """ A generator for the states accessible from this state via valid moves.
+
+        Produces exactly the same actions, in the same order, as
+        state.next_states.
+
+        Args:
+            b: the bitboard
+            opponent: set to True if the opponent is making the move.
+            avoid: a container of keys (see key) of states not to generate
+
+        Yields:
+            tuples of the form (action, state) where action is the action
+            code (see state.action_code) and state is the bitboard resulting
+            from the action.
+    """
+    return _next_states(b, opponent, avoid, MOVE_RAYS, lambda h: range(1, h + 1))
+
+
+def next_states_end(b, opponent, avoid=dict()):
+    """ A generator for the states accessible from this state via valid moves,
+        using the end game move ordering.
+
+        Produces exactly the same actions, in the same order, as
+        state.next_states_end.
+
+        Args:
+            b: the bitboard
+            opponent: set to True if the opponent is making the move.
+            avoid: a container of keys (see key) of states not to generate
+
+        Yields:
+            tuples of the form (action, state) where action is the action
+            code (see state.action_code) and state is the bitboard resulting
+            from the action.
+    """
+    return _next_states(b, opponent, avoid, MOVE_RAYS_END, lambda h: range(h, 0, -1))
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,189 @@
+""" An opening book generated by deep searches.
+
+    The book maps the Zobrist key (see state.zobrist) of a position, with the
+    player to move positive, to the action code to play. Since positions are
+    looked up by key, a line which transposes into a book position is
+    recognised wherever it came from.
+
+    The book is built offline from the partB directory with
+        python3 -m pretty_fly_for_an_AI.book
+    by searching every position within the first BOOK_PLIES plies of the game
+    reached by following the players book moves and the REPLIES most likely 
+    replies of the opponent (see build). It is written to BOOK_FILE as an 
+    array of (key, action code) pairs.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from pretty_fly_for_an_AI import state as st
+from pretty_fly_for_an_AI import minimax
+from pretty_fly_for_an_AI.evaluation import reward
+from pretty_fly_for_an_AI.ordering import MoveOrdering
+from pretty_fly_for_an_AI.transposition import TranspositionTable
+
+BOOK_FILE = "./pretty_fly_for_an_AI/book.npy"
+
+# the number of plies from the start of the game covered by the book
+BOOK_PLIES = 12
+
+# the depth of the search for each book move
+BOOK_DEPTH = 5
+
+# the number of opponents replies followed from each book move, and the depth of
+# the search used to choose them
+REPLIES = 2
+REPLY_DEPTH = 2
+
+ENTRY_DTYPE = np.dtype([("key", "<u8"), ("move", "<u2")])
+
+
+def load(path=BOOK_FILE):
+    """ Loads a book written by write.
+
+        Returns:
+            A dictionary mapping Zobrist keys to action codes
+    """
+    records = np.load(path)
+    return dict(zip(records["key"].tolist(), records["move"].tolist()))
+
+
+def write(path, book):
+    """ Writes a book (a dictionary mapping keys to action codes) """
+    records = np.array(sorted(book.items()), dtype=ENTRY_DTYPE)
+    np.save(path, records)
+
+
+def probe(book, s, avoid=()):
+    """ Looks up the book move of a position.
+
+        Args:
+            book: a dictionary returned by load
+            s: the board state, with the player to move
+            avoid: keys (see state.key) of states not to move to
+
+        Returns:
+            The action code, or None if s is not in the book (or the move is
+            not allowed).
+    """
+    move = book.get(st.zobrist(s))
+
+    # guards against a collision of keys
+    if move is None or move not in st.next_actions(s, False, avoid=avoid):
+        return None
+    return move
+
+
+def likely_replies(s, ev, best, replies=REPLIES, depth=REPLY_DEPTH):
+    """ The most likely actions from s: best, then the best of the others by a
+        search of each to depth.
+
+        Args:
+            s: the board state, with the player to move
+            ev: the evaluation function of the player to move
+            best: the best action found by a deep search
+
+        Returns:
+            A list of at most replies action codes, most likely first.
+    """
+    search = minimax.Search(minimax.Expander(st), minimax.static_leaf(ev))
+
+    actions = [action for action in st.next_actions(s, False) if action != best]
+    scores = []
+    for action in actions:
+        child = st.apply_action(s, action, False)
+        v, _, _ = minimax.negamax(child, depth - 1, -float("inf"), float("inf"), True, search)
+        scores.append(-v)
+
+    # stable, so ties keep the generated order
+    others = np.argsort(-np.array(scores), kind="stable")[:replies - 1]
+    return [best] + [actions[i] for i in others]
+
+
+def build(weights, plies=BOOK_PLIES, depth=BOOK_DEPTH, replies=REPLIES, log=print):
+    """ Builds the book for both colors.
+
+        For each color the tree of positions within plies of the start is 
+        followed from the start position, taking the book move of that color
+        and the likely replies of the opponent (see likely_replies). Every 
+        position in the tree is searched, so the opponents most likely reply
+        is the move the player would make in its place.
+
+        Args:
+            weights: a dictionary mapping each color to the weights of its
+            evaluation function (see evaluation.reward)
+            plies: the number of plies covered
+            depth: the search depth of each book move
+            replies: the number of opponents replies followed
+
+        Returns:
+            A dictionary mapping Zobrist keys to action codes
+    """
+    book = {}
+    expanded = set()
+    table = TranspositionTable()
+    ordering = MoveOrdering()
+
+    def other(color):
+        return st.BLACK_COLOR if color == st.WHITE_COLOR else st.WHITE_COLOR
+
+    def book_move(s, ply, color):
+        """ s is from the point of view of color, which is to move """
+        key = st.zobrist(s)
+        if key not in book:
+            ev = lambda b: reward(b, weights[color])
+            ordering.age()
+            book[key], _ = minimax.iterative_deepening(minimax.alpha_beta_search_tt, s, ev, depth,
+                                                       float("inf"), prev_states=set(), table=table,
+                                                       ordering=ordering, quiesce=True)
+            log(f"{len(book):5d} {color} ply {ply}: {st.action_name(book[key])}")
+        return book[key]
+
+    def expand(s, ply, color, player):
+        """ s is from the point of view of color, which is to move, in the 
+            tree of player """
+        key = (st.zobrist(s), player)
+        if ply >= plies or key in expanded:
+            return
+        expanded.add(key)
+
+        best = book_move(s, ply, color)
+        if color == player:
+            actions = [best]
+        else:
+            actions = likely_replies(s, lambda b: reward(b, weights[color]), best, replies)
+
+        for action in actions:
+            child = st.apply_action(s, action, False)
+            if not st.is_gameover(child):
+                expand(-child, ply + 1, other(color), player)
+
+    for player in (st.WHITE_COLOR, st.BLACK_COLOR):
+        expand(st.create_start_state(st.WHITE_COLOR), 0, st.WHITE_COLOR, player)
+    return book
+
+
+def main():
+    # the weights of the main player
+    from pretty_fly_for_an_AI.player import Player
+
+    parser = argparse.ArgumentParser(description="Build the opening book.")
+    parser.add_argument("--plies", "-p", type=int, default=BOOK_PLIES, help="The number of plies covered.")
+    parser.add_argument("--depth", "-d", type=int, default=BOOK_DEPTH, help="The search depth of book moves.")
+    parser.add_argument("--replies", "-r", type=int, default=REPLIES,
+                        help="The number of opponents replies followed from each book move.")
+    parser.add_argument("--output", "-o", default=BOOK_FILE, help="The file to write.")
+    args = parser.parse_args()
+
+    weights = {st.WHITE_COLOR: Player.weights_white, st.BLACK_COLOR: Player.weights_black}
+
+    t0 = time.process_time()
+    book = build(weights, args.plies, args.depth, args.replies)
+    write(args.output, book)
+    print(f"{len(book)} positions written to {args.output} in {time.process_time() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
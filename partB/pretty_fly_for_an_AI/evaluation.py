@@ -19,6 +19,61 @@ def reward(state, weights):
     feature_vals = feature(state)
     return tanh(sum(w * f for w, f in zip(feature_vals, weights)))
 
+# the coordinates of each board index (see state.itop), used by features_batch
+XS = np.array([st.itop(i)[0] for i in range(st.BOARD_SIZE ** 2)])
+YS = np.array([st.itop(i)[1] for i in range(st.BOARD_SIZE ** 2)])
+
+def reward_batch(boards, weights):
+    """ The reward function of every board in a 2-D array at once. Returns an
+        array of rewards, exactly the same as those of reward """
+    ours = np.count_nonzero(boards > 0, axis=1)
+    theirs = np.count_nonzero(boards < 0, axis=1)
+
+    # summed in the same order as reward, and math.tanh (which can differ from
+    # np.tanh in the last bit) so that the rewards are exactly the same
+    total = 0
+    for f, w in zip(features_batch(boards).T, weights):
+        total = total + f * w
+    rewards = np.fromiter(map(tanh, total.tolist()), dtype=np.float64, count=len(total))
+
+    # game over: a draw if no tokens are left, otherwise a win or loss
+    rewards[theirs == 0] = 1
+    rewards[ours == 0] = -1
+    rewards[(ours == 0) & (theirs == 0)] = 0
+    return rewards
+
+def features_batch(boards):
+    """ Calculates the feature values of every board in a 2-D array at once.
+        Returns an N x F array where row k holds the values of feature for 
+        boards[k] """
+    ours_idx = boards > 0
+    theirs_idx = boards < 0
+    num_ours = np.count_nonzero(ours_idx, axis=1)
+    num_theirs = np.count_nonzero(theirs_idx, axis=1)
+
+    # distance between the centres of mass, where both players have tokens
+    both = (num_ours > 0) & (num_theirs > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        our_com_x = (ours_idx @ XS) / num_ours
+        our_com_y = (ours_idx @ YS) / num_ours
+        their_com_x = (theirs_idx @ XS) / num_theirs
+        their_com_y = (theirs_idx @ YS) / num_theirs
+    our_com_to_theirs = np.where(both, np.abs(our_com_x - their_com_x) + np.abs(our_com_y - their_com_y), 1)
+    our_com_to_theirs[our_com_to_theirs == 0] = 1
+
+    boards = boards.astype(np.int64)
+    our_sum = np.where(ours_idx, boards, 0).sum(axis=1)
+    their_sum = np.where(theirs_idx, boards, 0).sum(axis=1)
+    diff = our_sum + their_sum
+
+    return np.stack([
+        ((diff ** 2) * np.sign(diff)) / 144,
+        our_sum / (our_com_to_theirs * 12),
+        their_sum / (our_com_to_theirs * 12),
+        num_ours / 12,
+        num_theirs / 12
+    ], axis=1)
+
 def feature(state):
     """ Calculates a list of feature values given a state. Used by the reward 
         function"""
@@ -57,3 +112,132 @@ def dpartial_reward(state, weights, i):
 
 def manhattan(pos1, pos2):
     return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
+
+# Incremental evaluation. Every feature is computed from the totals of a state:
+# the tuple (our_sum, their_sum, num_ours, num_theirs, our_x, our_y, their_x,
+# their_y) of the number of tokens, number of stacks and sums of the
+# coordinates of the stacks of each player. An action only changes the totals
+# of the squares it touches, so they are updated as actions are applied
+# instead of being recomputed from every square.
+
+def totals(state):
+    """ Computes the totals of a state from scratch """
+    t = (0, 0, 0, 0, 0, 0, 0, 0)
+    for i in np.flatnonzero(state).tolist():
+        t = _change(t, i, 0, int(state[i]))
+    return t
+
+def _change(t, i, old, new):
+    """ The totals t after the stack at board index i changes from old to new
+        (signed heights) """
+    our_sum, their_sum, num_ours, num_theirs, our_x, our_y, their_x, their_y = t
+    x, y = st.itop(i)
+    for h, sgn in ((old, -1), (new, 1)):
+        if h > 0:
+            our_sum += sgn * h
+            num_ours += sgn
+            our_x += sgn * x
+            our_y += sgn * y
+        elif h < 0:
+            their_sum += sgn * h
+            num_theirs += sgn
+            their_x += sgn * x
+            their_y += sgn * y
+    return our_sum, their_sum, num_ours, num_theirs, our_x, our_y, their_x, their_y
+
+def move_totals(t, state, num_tokens, si, ei, opponent):
+    """ Finds the totals of st.move(state, num_tokens, si, ei, opponent) from
+        t, the totals of state """
+    # opponent stacks are stored as negative values
+    if opponent:
+        num_tokens = -num_tokens
+
+    hs, he = int(state[si]), int(state[ei])
+    t = _change(t, si, hs, hs - num_tokens)
+    return _change(t, ei, he, he + num_tokens)
+
+def boom_totals(t, state, cleared):
+    """ Finds the totals of the state resulting from the board indexes in 
+        cleared (see st.boom_cleared) being removed from state, from t, the 
+        totals of state """
+    for i in cleared.tolist():
+        t = _change(t, i, int(state[i]), 0)
+    return t
+
+def action_totals(t, state, action, opponent):
+    """ Finds the totals of st.apply_action(state, action, opponent) from t, 
+        the totals of state """
+    num_tokens, si, ei = action >> 12, (action >> 6) & 63, action & 63
+    if num_tokens == 0:
+        return boom_totals(t, state, st.boom_cleared(state, si))
+    return move_totals(t, state, num_tokens, si, ei, opponent)
+
+def reward_totals(t, weights):
+    """ The reward function of a state computed from its totals. This is 
+        exactly the same as reward """
+    our_sum, their_sum, num_ours, num_theirs, our_x, our_y, their_x, their_y = t
+
+    # game over
+    if num_ours == 0 or num_theirs == 0:
+        if num_ours == 0 and num_theirs == 0:
+            return 0
+        if num_theirs == 0:
+            return 1
+        return -1
+
+    our_com_to_theirs = abs(our_x / num_ours - their_x / num_theirs) + abs(our_y / num_ours - their_y / num_theirs)
+    if our_com_to_theirs == 0:
+        our_com_to_theirs = 1
+
+    diff = our_sum + their_sum
+    sign = (diff > 0) - (diff < 0)
+
+    feature_vals = [
+        ((diff ** 2) * sign) / 144,
+        our_sum / (our_com_to_theirs * 12),
+        their_sum / (our_com_to_theirs * 12),
+        num_ours / 12,
+        num_theirs / 12
+    ]
+    return tanh(sum(w * f for w, f in zip(feature_vals, weights)))
+
+class IncrementalReward:
+    """ The reward function of a board which is searched by applying and 
+        undoing actions (see minimax.Expander). The totals of the board are 
+        kept up to date as actions are applied and undone, so scoring the 
+        board only takes a few arithmetic operations.
+
+        Boards other than the tracked one (e.g. those scored by a search 
+        which does not apply its actions through the tracker) are scored from
+        scratch with reward.
+
+        Attributes:
+            weights: the weights of the reward function
+            board: the tracked board, which is modified in place
+            stack: the totals of the board after each action applied since 
+            reset, the current board last
+    """
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.board = None
+        self.stack = []
+
+    def reset(self, state):
+        """ Starts tracking a board from state """
+        self.board = state
+        self.stack = [totals(state)]
+
+    def apply(self, state, action, opponent):
+        """ Called before action is applied to state """
+        self.stack.append(action_totals(self.stack[-1], state, action, opponent))
+
+    def undo(self):
+        """ Called after the last action applied is undone """
+        self.stack.pop()
+
+    def __call__(self, state):
+        """ The reward of state """
+        if state is not self.board:
+            return reward(state, self.weights)
+        return reward_totals(self.stack[-1], self.weights)
@@ -0,0 +1,153 @@
+""" Precomputed board geometry shared by the board engines (state.py and
+    bitboard.py) and the referee.
+
+    Everything here is built once at import time, so looking up the squares
+    around a stack or the squares a stack can move to never builds a list.
+
+    Squares are given either as board indexes (see state.ptoi) or as (x, y)
+    board coordinates. Masks are 64 bit integers where bit i is set iff board
+    index i is included.
+"""
+
+import numpy as np
+
+# the x/y length of the board
+BOARD_SIZE = 8
+
+BOARD_SQUARES = BOARD_SIZE ** 2
+
+# the largest possible stack height
+MAX_HEIGHT = 12
+
+# explosion radius
+ER = 1
+
+
+def _in_board(x, y):
+    return 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE
+
+
+def _mask(idxs):
+    mask = 0
+    for i in idxs:
+        mask |= 1 << int(i)
+    return mask
+
+
+def _near(i):
+    """ The board indexes in the explosion radius of i (excluding i) in the
+        order used by the board engines """
+    x0, y0 = ITOP[i]
+    poss = [(x0 - 1, y0 - 1), (x0 - 1, y0), (x0 - 1, y0 + 1),
+            (x0, y0 - 1), (x0, y0 + 1),
+            (x0 + 1, y0 - 1), (x0 + 1, y0), (x0 + 1, y0 + 1)]
+    return [x + BOARD_SIZE * y for x, y in poss if _in_board(x, y)]
+
+
+def _at_distance(i, d):
+    """ The board indexes exactly d squares from i in a straight line, in the
+        order down, up, left, right """
+    x0, y0 = ITOP[i]
+    poss = [(x0, y0 - d), (x0, y0 + d), (x0 - d, y0), (x0 + d, y0)]
+    return [x + BOARD_SIZE * y for x, y in poss if _in_board(x, y)]
+
+
+def _rays(i, h, step):
+    """ The board indexes a stack of height h at i can move to, from furthest
+        first to closest last, taking every step-th distance """
+    return tuple(j for d in range(h, 0, -step) for j in _at_distance(i, d))
+
+
+# board index -> (x, y) board coordinate
+ITOP = tuple((i % BOARD_SIZE, i // BOARD_SIZE) for i in range(BOARD_SQUARES))
+
+# (x, y) board coordinate -> board index
+PTOI = {p: i for i, p in enumerate(ITOP)}
+
+# NEAR_INDEXES[i] is an array of the board indexes in the explosion radius of i
+# (excluding i) and NEAR_MASKS[i] the corresponding mask
+NEAR_INDEXES = tuple(np.array(_near(i), dtype=np.intp) for i in range(BOARD_SQUARES))
+NEAR_MASKS = tuple(_mask(_near(i)) for i in range(BOARD_SQUARES))
+
+# DISTANCE_MASKS[i][d] is the mask of board indexes a distance d from i in a
+# straight line, and MOVE_MASKS[i][h] the mask of every board index a stack of
+# height h at i can reach
+DISTANCE_MASKS = tuple(
+    tuple(_mask(_at_distance(i, d)) if d else 0 for d in range(MAX_HEIGHT + 1))
+    for i in range(BOARD_SQUARES)
+)
+MOVE_MASKS = tuple(
+    tuple(_mask(_rays(i, h, 1)) for h in range(MAX_HEIGHT + 1))
+    for i in range(BOARD_SQUARES)
+)
+
+# MOVE_RAYS[i][h] are the board indexes a stack of height h at i can move to,
+# in the order tried by state.next_states. MOVE_RAYS_END[i][h] are those tried
+# by state.next_states_end
+MOVE_RAYS = tuple(
+    tuple(_rays(i, h, 1) for h in range(MAX_HEIGHT + 1)) for i in range(BOARD_SQUARES)
+)
+MOVE_RAYS_END = tuple(
+    tuple(_rays(i, h, 2) for h in range(MAX_HEIGHT + 1)) for i in range(BOARD_SQUARES)
+)
+
+# NEAR_PADDED[i] is NEAR_INDEXES[i] padded to length 8 with BOARD_SQUARES, so
+# that neighbours of many squares can be gathered at once from a board with an
+# extra empty entry appended
+NEAR_PADDED = np.full((BOARD_SQUARES, 8), BOARD_SQUARES, dtype=np.intp)
+for _i, _near_i in enumerate(NEAR_INDEXES):
+    NEAR_PADDED[_i, :len(_near_i)] = _near_i
+
+
+def _move_arrays(rays, tokens):
+    """ Flattens a move ray table into (end indexes, numbers of tokens) arrays
+        listing every move of a stack in generation order """
+    table = []
+    for i in range(BOARD_SQUARES):
+        row = []
+        for h in range(MAX_HEIGHT + 1):
+            moves = [(j, n) for j in rays[i][h] for n in tokens(h)]
+            row.append(np.array(moves, dtype=np.intp).reshape(-1, 2).T.copy())
+        table.append(tuple(row))
+    return tuple(table)
+
+
+# MOVE_ARRAYS[i][h] is a 2 x M array whose columns are the (end index, number of
+# tokens) of every move of a stack of height h at i, in the order generated by
+# state.next_states. MOVE_ARRAYS_END is the same for state.next_states_end
+MOVE_ARRAYS = _move_arrays(MOVE_RAYS, lambda h: range(1, h + 1))
+MOVE_ARRAYS_END = _move_arrays(MOVE_RAYS_END, lambda h: range(h, 0, -1))
+
+# masks of every square not in the first/last column, and of the whole board
+NOT_FIRST_COLUMN = _mask(i for i in range(BOARD_SQUARES) if ITOP[i][0] != 0)
+NOT_LAST_COLUMN = _mask(i for i in range(BOARD_SQUARES) if ITOP[i][0] != BOARD_SIZE - 1)
+FULL_MASK = (1 << BOARD_SQUARES) - 1
+
+
+def mask_indexes(mask):
+    """ The board indexes of the set bits of mask, in increasing order """
+    idxs = []
+    while mask:
+        low = mask & -mask
+        idxs.append(low.bit_length() - 1)
+        mask ^= low
+    return idxs
+
+
+def neighbourhood(mask):
+    """ The mask of every square in mask or in the explosion radius of a square
+        in mask """
+    # spread along rows without wrapping onto the next row, then along columns
+    row = mask | ((mask << 1) & NOT_FIRST_COLUMN) | ((mask >> 1) & NOT_LAST_COLUMN)
+    return (row | (row << BOARD_SIZE) | (row >> BOARD_SIZE)) & FULL_MASK
+
+
+# the same tables keyed by (x, y) coordinate, as sets of coordinates
+NEAR_SQUARES = {ITOP[i]: frozenset(ITOP[j] for j in _near(i)) for i in range(BOARD_SQUARES)}
+NEXT_SQUARES = {
+    ITOP[i]: tuple(
+        frozenset(ITOP[j] for j in _at_distance(i, d)) if d else frozenset([ITOP[i]])
+        for d in range(MAX_HEIGHT + 1)
+    )
+    for i in range(BOARD_SQUARES)
+}
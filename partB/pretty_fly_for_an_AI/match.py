@@ -0,0 +1,146 @@
+""" Plays a fixed set of referee games between two Players, to compare
+    variants of the search by their results and the work done per move.
+
+    Run from the partB directory with, e.g.:
+        python3 -m pretty_fly_for_an_AI.match pretty_fly_for_an_AI:PrunedPlayer pretty_fly_for_an_AI:Player
+
+    Each game starts with an opening of random moves (the same for a given
+    seed), after which the players choose their own moves. Every opening is
+    played twice, with each player as white. The search statistics of each
+    player are collected through Player.trace (see minimax.SearchStats).
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import uuid
+
+from pretty_fly_for_an_AI import state as st
+from referee.game import play
+from referee.player import PlayerWrapper
+
+
+def opening_lines(num_lines, plies, seed=0):
+    """ Generates the fixed openings by playing random moves from the start
+        position.
+
+        Args:
+            num_lines: the number of openings
+            plies: the number of moves in each opening
+            seed: the random seed
+
+        Returns:
+            A list of lists of actions (in the referee's format)
+    """
+    rng = random.Random(seed)
+
+    lines = []
+    while len(lines) < num_lines:
+        s = st.create_start_state(st.WHITE_COLOR)
+        line = []
+        for ply in range(plies):
+            opponent = ply % 2 == 1
+            action = rng.choice(list(st.next_actions(s, opponent)))
+            s = st.apply_action(s, action, opponent)
+            line.append(st.action_name(action))
+            if st.is_gameover(s):
+                break
+        else:
+            lines.append(line)
+    return lines
+
+
+class _Opening:
+    """ Wraps a PlayerWrapper, playing the moves of an opening (for both
+        colors) before asking the player for its actions """
+
+    def __init__(self, wrapper, line):
+        self.wrapper = wrapper
+        self.line = line
+        self.ply = 0
+
+    @property
+    def name(self):
+        return self.wrapper.name
+
+    @property
+    def colour(self):
+        return self.wrapper.colour
+
+    def init(self, colour):
+        self.wrapper.init(colour)
+
+    def action(self):
+        if self.ply < len(self.line):
+            return self.line[self.ply]
+        return self.wrapper.action()
+
+    def update(self, colour, action):
+        self.ply += 1
+        self.wrapper.update(colour, action)
+
+
+def _traced(player_cls, path, game_id):
+    """ A subclass of player_cls which traces its searches to path, as part of
+        the game game_id """
+    return type(player_cls.__name__, (player_cls,), {"trace": path, "game_id": game_id})
+
+
+def _summarise(path):
+    """ The number of searched moves, and the total nodes and depth of the
+        searches, in a trace file """
+    moves = nodes = depth = 0
+    if os.path.exists(path):
+        with open(path) as fp:
+            for line in fp:
+                record = json.loads(line)
+                if "nodes" in record:
+                    moves += 1
+                    nodes += record["nodes"]
+                    depth += record["depth"]
+    return moves, nodes, depth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a fixed set of games between two players.")
+    parser.add_argument("players", nargs=2, help="The two players, as package:Class.")
+    parser.add_argument("--openings", "-n", type=int, default=6, help="The number of openings.")
+    parser.add_argument("--plies", "-p", type=int, default=4, help="The number of moves in each opening.")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="The random seed for the openings.")
+    parser.add_argument("--time", "-t", type=float, default=60, help="The CPU time limit of each player.")
+    args = parser.parse_args()
+
+    specs = [tuple(spec.split(":", 1)) if ":" in spec else (spec, "Player") for spec in args.players]
+    tmp = tempfile.mkdtemp()
+    traces = [os.path.join(tmp, f"{i}.jsonl") for i in range(2)]
+
+    # wins, draws and losses of the first player
+    results = [0, 0, 0]
+    for n, line in enumerate(opening_lines(args.openings, args.plies, args.seed)):
+        for first_white in (True, False):
+            wrappers = [PlayerWrapper(f"player {i + 1}", spec, time_limit=args.time) for i, spec in enumerate(specs)]
+            game_id = uuid.uuid4().hex
+            for wrapper, path in zip(wrappers, traces):
+                wrapper.Player = _traced(wrapper.Player, path, game_id)
+
+            players = wrappers if first_white else wrappers[::-1]
+            result = play([_Opening(wrapper, line) for wrapper in players], print_state=False)
+
+            if result.startswith("winner"):
+                first_won = result.endswith("white") == first_white
+                results[0 if first_won else 2] += 1
+            else:
+                results[1] += 1
+            print(f"opening {n} ({args.players[0]} {'white' if first_white else 'black'}): {result}")
+
+    print(f"{args.players[0]}: {results[0]} wins, {results[1]} draws, {results[2]} losses")
+    for name, path in zip(args.players, traces):
+        moves, nodes, depth = _summarise(path)
+        if moves:
+            print(f"{name}: {nodes / moves:.0f} nodes and depth {depth / moves:.2f} per searched move "
+                  f"({moves} moves)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,212 +1,889 @@
-from pretty_fly_for_an_AI import state as st
-import numpy as np
-import math
-
+""" The game tree searches used by the players.
+
+    Every search is made by negamax, a single alpha-beta search core. The 
+    parts which differ between players are passed to it in a Search:
+        expander: generates and applies actions (see Expander)
+        leaf: scores the leaves of the search (see static_leaf and 
+        quiescence_leaf)
+        table: an optional transposition.TranspositionTable
+        ordering: an optional ordering.MoveOrdering
+        stats: an optional SearchStats, which counts what was searched
+        capture: set to True to return the leaf state at the end of the 
+        principal variation (used for learning)
+        pvs: set to True to search all but the first child with a null window
+        (principal variation search)
+        reductions: set to True to search late quiet actions to a reduced 
+        depth first (late move reductions)
+        futility: an optional static evaluation (called as a leaf) used to 
+        skip quiet actions near the horizon which cannot raise alpha
+        (futility pruning)
+        memory: an optional reuse.SearchMemory, which orders the actions of
+        states near the root by what the previous search found
+        batch: an optional evaluation function of a 2-D array of boards (see
+        evaluation.reward_batch). The children of states with one ply left 
+        are then generated and scored at once (state engine only, and only 
+        with static leaves, see frontier)
+"""
+
+from collections import namedtuple
+import time
 
-# Learner variation with logging ----------------------------------- #
-
-def alpha_beta_search_ml(state, depth, ev, ml_logger, prev_states, expan):
-    alpha = -float("inf")
-    beta = float("inf")
+import numpy as np
 
-    if np.count_nonzero(state) < 6:
-        expander = lambda s, opponent: st.next_states_end(s, opponent, avoid=prev_states)
-    else:
-        expander = lambda s, opponent: expan(s, opponent, avoid=prev_states)
+from pretty_fly_for_an_AI import state as st
+from pretty_fly_for_an_AI import transposition as tt
+from pretty_fly_for_an_AI import reuse
+from pretty_fly_for_an_AI.tablebase import terminal_score
+from pretty_fly_for_an_AI.timing import SearchTimeout
+
+# the end game move ordering is used once fewer than this many stacks remain
+END_GAME_STACKS = 6
+
+# the width of the null windows searched by mtdf and principal variation 
+# search. Scores closer than this are treated as equal
+NULL_WINDOW = 1e-9
+
+# the half width of the first aspiration window of principle_variation_search,
+# and the factor by which it grows each time the score falls outside it
+ASPIRATION_WIDTH = 0.01
+ASPIRATION_GROWTH = 4
+
+# the maximum number of booms searched by quiescence beyond the search depth
+QUIESCENCE_DEPTH = 4
+
+# late move reductions: quiet actions searched after the first LMR_MOVES 
+# actions of a state with at least LMR_DEPTH plies left are first searched 
+# LMR_REDUCTION plies shallower, and only searched fully if they beat alpha
+LMR_MOVES = 3
+LMR_DEPTH = 3
+LMR_REDUCTION = 1
+
+# FUTILITY_MARGINS[d] bounds how much the static score of a state with d plies
+# left can rise through quiet actions. Measured over midgame positions with 
+# the learned weights, a quiet action changed reward by at most 0.0104 (0.0089
+# at the 99.9th percentile) and a quiet action and any reply by at most 
+# 0.0211, so the margins are set just above these maxima
+FUTILITY_MARGINS = (0, 0.011, 0.022)
+
+# an iteration is not started unless the time remaining is at least this many 
+# times the time taken by the previous iteration
+MIN_ITERATION_RATIO = 4
+
+
+# Search core --------------------------------------------------------------- #
+Search = namedtuple("Search", ["expander", "leaf", "table", "ordering", "stats", "capture", "pvs",
+                               "reductions", "futility", "memory", "batch"],
+                    defaults=[None, None, None, False, False, False, None, None, None])
+
+
+class Expander:
+    """ Generates, applies and undoes actions for a board engine.
+
+        Attributes:
+            engine: the board engine (state or bitboard)
+            avoid: a container of keys of states which are not to be generated
+            end: set to True to use the end game move ordering
+            inplace: set to True to apply actions to the searched board in 
+            place instead of creating new boards (state engine only)
+            tracker: an optional evaluation.IncrementalReward which is kept up
+            to date with the searched board (state engine only)
+    """
+
+    def __init__(self, engine=st, avoid=(), end=False, inplace=False, tracker=None):
+        self.engine = engine
+        self.avoid = avoid
+        self.end = end
+        self.inplace = inplace
+        self.tracker = tracker
+
+    def actions(self, s, opponent):
+        """ Generates the action codes of s """
+        if self.end:
+            return self.engine.next_actions_end(s, opponent, avoid=self.avoid)
+        return self.engine.next_actions(s, opponent, avoid=self.avoid)
+
+    def apply(self, s, action, opponent):
+        """ Applies an action to s.
+
+            Returns:
+                A tuple (child, record) where child is the resulting state and
+                record is passed to undo once the child has been searched.
+        """
+        if self.tracker is not None:
+            self.tracker.apply(s, action, opponent)
+        if self.inplace:
+            return s, st.apply_action_inplace(s, action, opponent)
+        return self.engine.apply_action(s, action, opponent), None
+
+    def undo(self, s, record):
+        if record is not None:
+            st.undo(s, record)
+        if self.tracker is not None:
+            self.tracker.undo()
+
+    def children(self, s, opponent):
+        """ Generates the action codes and children of s at once (state 
+            engine only, see state.next_states_batch) """
+        if self.end:
+            return st.next_states_end_batch(s, opponent, self.avoid)
+        return st.next_states_batch(s, opponent, self.avoid)
+
+    def snapshot(self, s):
+        """ A copy of s which is not modified by the search """
+        return s.copy() if self.inplace else s
+
+    def key(self, s, opponent):
+        """ The Zobrist key of s (state engine only) """
+        return st.zobrist(s, opponent)
+
+    def child_key(self, z, s, action, opponent):
+        """ The key of the result of applying action to s, where z is the key
+            of s (state engine only) """
+        return st.action_key(z, s, action, opponent)
+
+    def without_avoid(self):
+        """ An Expander generating every action with the end game ordering, 
+            used when every action would lead to an avoided state """
+        return Expander(self.engine, end=True, inplace=self.inplace, tracker=self.tracker)
+
+
+def expander_for(state, prev_states, engine=st, inplace=False, tracker=None):
+    """ The expander used by most searches: avoids prev_states and uses the 
+        end game move ordering once fewer than END_GAME_STACKS stacks remain """
+    return Expander(engine, prev_states, engine.num_stacks(state) < END_GAME_STACKS, inplace, tracker)
+
+
+class SearchStats:
+    """ Statistics about the states searched, used to tune the search. Passed 
+        to negamax in a Search (and to iterative_deepening), so they are only 
+        collected when asked for.
+
+        Attributes:
+            nodes: the number of states searched (including leaves)
+            leaves: the number of leaves scored
+            cutoffs: cutoffs[i] is the number of cut offs caused by the i-th 
+            action searched from a state, so good move ordering has most of 
+            them at index 0
+            iterations: a list with a dictionary for each iteration of 
+            iterative deepening (see start_iteration and end_iteration)
+            reduced: the number of actions searched to a reduced depth (late
+            move reductions)
+            researched: the number of those searched again to the full depth
+            pruned: the number of actions skipped by futility pruning
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = []
+        self.iterations = []
+        self.reduced = 0
+        self.researched = 0
+        self.pruned = 0
+
+    def node(self, ply):
+        self.nodes += 1
+
+    def leaf(self, ply):
+        self.leaves += 1
+
+    def cutoff(self, ply, index):
+        """ Called when the index-th action at ply causes a cut off """
+        if index >= len(self.cutoffs):
+            self.cutoffs.extend([0] * (index + 1 - len(self.cutoffs)))
+        self.cutoffs[index] += 1
+
+    def reduce(self, ply, researched):
+        """ Called when an action at ply is searched to a reduced depth, with
+            researched set to True if it is then searched to the full depth """
+        self.reduced += 1
+        self.researched += researched
+
+    def prune(self, ply):
+        self.pruned += 1
+
+    def start_iteration(self, depth):
+        """ Called before searching to depth """
+        self._start = (self.nodes, self.leaves, time.process_time())
+        self.iterations.append({"depth": depth})
+
+    def end_iteration(self, completed=True):
+        """ Called after the search started by start_iteration, with completed
+            set to False if it ran out of time. Records the nodes, leaves and 
+            time of the iteration and its effective branching factor: the 
+            ratio of its nodes to those of the previous iteration. """
+        nodes, leaves, t0 = self._start
+        iteration = self.iterations[-1]
+        iteration["completed"] = completed
+        iteration["nodes"] = self.nodes - nodes
+        iteration["leaves"] = self.leaves - leaves
+        iteration["seconds"] = time.process_time() - t0
+
+        previous = self.iterations[-2]["nodes"] if len(self.iterations) > 1 else 0
+        iteration["ebf"] = iteration["nodes"] / previous if completed and previous else None
+
+    def first_cutoff_rate(self):
+        """ The fraction of cut offs caused by the first action searched """
+        total = sum(self.cutoffs)
+        return self.cutoffs[0] / total if total else None
+
+    def to_dict(self):
+        """ The statistics as a dictionary (which can be written as JSON) """
+        return {
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "cutoffs": self.cutoffs,
+            "first_cutoff_rate": self.first_cutoff_rate(),
+            "reduced": self.reduced,
+            "researched": self.researched,
+            "pruned": self.pruned,
+            "iterations": self.iterations,
+        }
+
+
+def negamax(s, depth, alpha, beta, opponent, search, z=None, ply=0):
+    """ The alpha-beta search core shared by all of the searches.
+
+        Scores are from the point of view of the player making the move, and 
+        are fail soft: a score <= alpha is an upper bound and a score >= beta
+        a lower bound.
+
+        Args:
+            s: the board state, which may be modified during the search but is
+            restored before returning
+            depth: the remaining search depth
+            alpha, beta: the search window
+            opponent: set to True if the opponent is making the move
+            search: the Search giving the parts of the search to use
+            z: the key of s (see Expander.key), if search has a table
+            ply: the number of actions from the root of the search to s. The 
+            table is never used to cut off the root, since the stored best 
+            action may no longer be allowed.
+
+        Returns:
+            A tuple (value, move, leaf) where value is the score of s, move the
+            best action code found and leaf the leaf state of the principal 
+            variation if search.capture is set (otherwise None).
+    """
+    stats = search.stats
+    if stats is not None:
+        stats.node(ply)
+
+    expander = search.expander
+    if depth == 0 or expander.engine.is_gameover(s):
+        if stats is not None:
+            stats.leaf(ply)
+        leaf_state = expander.snapshot(s) if search.capture else None
+        return search.leaf(s, alpha, beta, opponent), None, leaf_state
+
+    table = search.table
+    alpha_orig = alpha
+    tt_move = None
+    if table is not None:
+        entry = table.probe(z)
+        if entry is not None:
+            tt_depth, flag, value, tt_move = entry
+            if ply > 0 and tt_depth >= depth:
+                if flag == tt.EXACT:
+                    return value, tt_move, None
+                if flag == tt.LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, tt_move, None
+
+    if depth == 1 and search.batch is not None:
+        v, move = frontier(s, beta, opponent, search, ply)
+        if table is not None:
+            table.store(z, depth, _flag(v, alpha_orig, beta), v, move)
+        return v, move, None
+
+    actions = expander.actions(s, opponent)
+    if search.ordering is not None:
+        actions = search.ordering.order(actions, ply, opponent, tt_move)
+    elif tt_move is not None:
+        actions = _tt_first(actions, tt_move)
+
+    # remembered from the previous search
+    memory = search.memory
+    key = None
+    if memory is not None and ply < reuse.MEMORY_PLIES:
+        key = z if z is not None else expander.engine.key(s, opponent)
+        actions = memory.order(key, actions)
+    root_scores = [] if key is not None and ply == 0 else None
+
+    # near the horizon, quiet actions are skipped if even the static score 
+    # plus a margin cannot raise alpha. This bound is the score of s if 
+    # every action is skipped
+    futile = None
+    if search.futility is not None and ply > 0 and depth < len(FUTILITY_MARGINS) and alpha != -float("inf"):
+        bound = search.futility(s, alpha, beta, opponent) + FUTILITY_MARGINS[depth]
+        if bound <= alpha:
+            futile = bound
 
-    v, mv, pred_state = max_value_ml(state, depth, ev, alpha, beta, expander)
-    if mv is None:
-        expander = lambda s, opponent: st.next_states_black(s, opponent)
-        v, mv, pred_state = max_value_ml(state, depth, ev, alpha, beta, expander)
-    ml_logger.add(pred_state)
-    return mv
+    v = -float("inf")
+    move = None
+    leaf_state = None
+    for i, mv in enumerate(actions):
+        if futile is not None and not st.is_boom(mv):
+            if stats is not None:
+                stats.prune(ply)
+            v = max(v, futile)
+            continue
+
+        child_z = expander.child_key(z, s, mv, opponent) if table is not None else None
+        child, record = expander.apply(s, mv, opponent)
+
+        searched = False
+        if (search.reductions and i >= LMR_MOVES and depth >= LMR_DEPTH and alpha != -float("inf")
+                and not st.is_boom(mv)):
+            # a late quiet action is unlikely to beat alpha, which a shallower
+            # null window search can usually confirm. Otherwise it is searched
+            # again to the full depth
+            score, _, leaf = negamax(child, depth - 1 - LMR_REDUCTION, -alpha - NULL_WINDOW, -alpha,
+                                     not opponent, search, child_z, ply + 1)
+            score = -score
+            searched = score <= alpha
+            if stats is not None:
+                stats.reduce(ply, not searched)
+
+        if not searched and search.pvs and i > 0 and alpha != -float("inf"):
+            # test whether the child can beat alpha before searching it fully
+            score, _, leaf = negamax(child, depth - 1, -alpha - NULL_WINDOW, -alpha, not opponent,
+                                     search, child_z, ply + 1)
+            score = -score
+            if alpha < score < beta:
+                score, _, leaf = negamax(child, depth - 1, -beta, -score, not opponent, search, child_z,
+                                         ply + 1)
+                score = -score
+        elif not searched:
+            score, _, leaf = negamax(child, depth - 1, -beta, -alpha, not opponent, search, child_z,
+                                     ply + 1)
+            score = -score
 
+        expander.undo(s, record)
 
-def max_value_ml(state, depth, ev, alpha, beta, expander):
-    if depth == 0 or st.is_gameover(state):
-        return ev(state), None, state
+        if root_scores is not None:
+            root_scores.append((score, mv))
 
-    v = -float("inf")
-    move = None
-    pred_state = None
-    for mv, child_state in expander(state, False):
-        score, came_from, leaf_state = min_value_ml(child_state, depth - 1, ev, alpha, beta, expander)
         if score > v:
             v = score
-            pred_state = leaf_state
             move = mv
+            leaf_state = leaf
 
         if v >= beta:
-            return v, move, pred_state
-
+            if search.ordering is not None:
+                search.ordering.cutoff(mv, ply, depth, opponent)
+            if stats is not None:
+                stats.cutoff(ply, i)
+            break
         alpha = max(alpha, v)
-    return v, move, pred_state
 
+    if table is not None:
+        table.store(z, depth, _flag(v, alpha_orig, beta), v, move)
 
-def min_value_ml(state, depth, ev, alpha, beta, expander):
-    if depth == 0 or st.is_gameover(state):
-        return ev(state), None, state
+    if key is not None:
+        if root_scores is not None:
+            memory.store_root(key, root_scores)
+        if alpha_orig < v < beta:
+            memory.store(key, move, v, depth)
 
-    v = float("inf")
-    move = None
-    pred_state = None
-    for mv, child_state in expander(state, True):
-        score, came_from, leaf_state = max_value_ml(child_state, depth - 1, ev, alpha, beta, expander)
-        if score < v:
-            v = score
-            pred_state = leaf_state
-            move = mv
+    return v, move, leaf_state
 
-        if v <= alpha:
-            return v, move, pred_state
-        beta = min(beta, v)
-    return v, move, pred_state
 
+def frontier(s, beta, opponent, search, ply):
+    """ Searches s, which has one ply left, by generating all of its children
+        as a 2-D array and scoring them with a single call of search.batch.
 
-# Standard best player variation -------------------------------------- #
-def alpha_beta_search_learned(state, depth, ev, prev_states, expan):
-    alpha = -float("inf")
-    beta = float("inf")
-    if np.count_nonzero(state) < 6:
-        expander = lambda s, opponent: st.next_states_end(s, opponent, avoid=prev_states)
-    else:
-        expander = lambda s, opponent: expan(s, opponent, avoid=prev_states)
+        Every child is a leaf, so this finds the same value as searching them
+        one at a time (the exact value, which is within the bounds of a fail 
+        soft search of the window). Ties may be broken differently, since 
+        the children are in the order generated.
 
-    v, mv = max_value_learned(state, depth, ev, alpha, beta, expander)
+        Returns:
+            A tuple (value, move) as in negamax.
+    """
+    actions, children = search.expander.children(s, opponent)
+    if len(actions) == 0:
+        return -float("inf"), None
 
-    if mv is None:
-        expander = lambda s, opponent: st.next_states_end(s, opponent)
-        v, mv, pred_state = max_value_ml(state, depth, ev, alpha, beta, expander)
+    stats = search.stats
+    if stats is not None:
+        for _ in range(len(actions)):
+            stats.node(ply + 1)
+            stats.leaf(ply + 1)
 
-    return mv
+    sgn = -1 if opponent else 1
+    scores = sgn * search.batch(children)
 
+    best = int(np.argmax(scores))
+    v, move = float(scores[best]), int(actions[best])
+    if v >= beta and search.ordering is not None:
+        search.ordering.cutoff(move, ply, 1, opponent)
+    return v, move
 
-def max_value_learned(state, depth, ev, alpha, beta, expander):
-    if depth == 0 or st.is_gameover(state):
-        return ev(state), None
 
-    v = -float("inf")
-    move = None
-    for mv, child_state in expander(state, False):
-        score, came_from = min_value_learned(child_state, depth - 1, ev, alpha, beta, expander)
-        if score > v:
-            v = score
-            move = mv
+def _flag(v, alpha, beta):
+    """ The bound type of a fail soft score v of the window (alpha, beta) """
+    if v <= alpha:
+        return tt.UPPER
+    if v >= beta:
+        return tt.LOWER
+    return tt.EXACT
 
-        if v >= beta:
-            return v, move
 
-        alpha = max(alpha, v)
-    return v, move
+def _tt_first(actions, tt_move):
+    """ Orders the actions so that tt_move (if valid) is tried first """
+    actions = list(actions)
+    if tt_move in actions:
+        actions.remove(tt_move)
+        actions.insert(0, tt_move)
+    return actions
 
 
-def min_value_learned(state, depth, ev, alpha, beta, expander):
-    if depth == 0 or st.is_gameover(state):
-        return ev(state), None
+def search_root(state, depth, search, alpha=-float("inf"), beta=float("inf")):
+    """ Searches state, with the player to move.
 
-    v = float("inf")
-    move = None
-    for mv, child_state in expander(state, True):
-        score, came_from = max_value_learned(child_state, depth - 1, ev, alpha, beta, expander)
-        if score < v:
-            v = score
-            move = mv
+        If every action leads to an avoided state the search is repeated 
+        without avoiding any (see Expander.without_avoid).
 
-        if v <= alpha:
-            return v, move
-        beta = min(beta, v)
-    return v, move
+        Args:
+            state: the board state, which is not modified
+            depth: the search depth
+            search: the Search giving the parts of the search to use
+            alpha, beta: the search window
 
+        Returns:
+            A tuple (value, move, leaf) as in negamax.
+    """
+    board = search.expander.snapshot(state)
+    z = search.expander.key(board, False) if search.table is not None else None
+    if search.expander.tracker is not None:
+        search.expander.tracker.reset(board)
 
-# Implementation for moderate player ------------------------------------------ #
-def alpha_beta_search(state, depth, ev):
-    alpha = -float("inf")
-    beta = float("inf")
-    v, mv = max_value(state, depth, ev, alpha, beta)
-    return mv
+    v, mv, leaf = negamax(board, depth, alpha, beta, False, search, z)
 
+    if mv is None and search.expander.avoid:
+        search = search._replace(expander=search.expander.without_avoid())
+        v, mv, leaf = negamax(board, depth, alpha, beta, False, search, z)
+
+    return v, mv, leaf
+
+
+def static_leaf(ev):
+    """ Scores leaves with the evaluation function ev """
+    def leaf(s, alpha, beta, opponent):
+        sgn = -1 if opponent else 1
+        return sgn * ev(s)
+    return leaf
+
+
+def quiescence_leaf(ev):
+    """ Scores leaves with quiescence search using the evaluation function ev
+        (see quiescence) """
+    def leaf(s, alpha, beta, opponent):
+        return quiescence(s, alpha, beta, opponent, ev, QUIESCENCE_DEPTH)
+    return leaf
+
+
+def tablebase_leaf(tablebase, leaf):
+    """ Scores leaves in the tablebase exactly (see tablebase.Tablebase.score)
+        and the others with leaf. Game over leaves are scored on the same 
+        scale as the tablebase (see tablebase.terminal_score) """
+    def tb_leaf(s, alpha, beta, opponent):
+        v = terminal_score(s, opponent)
+        if v is None:
+            v = tablebase.score(s, opponent)
+        return leaf(s, alpha, beta, opponent) if v is None else v
+    return tb_leaf
+
+
+def quiescence(s, alpha, beta, opponent, ev, depth):
+    """ Searches only boom actions from s until no boom is possible (or depth
+        booms have been made), so that leaves are not evaluated in the middle 
+        of an exchange of explosions.
+
+        The player making the move may always choose not to boom, so the
+        evaluation of s (the stand pat score) is a lower bound on its score.
+
+        Args:
+            s: the board state, which is modified during the search and 
+            restored before returning
+            alpha, beta: the search window, from the point of view of the 
+            player making the move
+            opponent: set to True if the opponent is making the move
+            ev: the evaluation function
+            depth: the maximum number of booms to search
+
+        Returns:
+            The score of s for the player making the move.
+    """
+    sgn = -1 if opponent else 1
+    v = sgn * ev(s)
+
+    if depth == 0 or v >= beta or st.is_gameover(s):
+        return v
+    alpha = max(alpha, v)
+
+    for action in st.next_booms(s, opponent):
+        record = st.apply_action_inplace(s, action, opponent)
+        score = -quiescence(s, -beta, -alpha, not opponent, ev, depth - 1)
+        st.undo(s, record)
 
-def max_value(state, depth, ev, alpha, beta):
-    if depth == 0 or st.is_gameover(state):
-        return ev(state), None
-    v = -float("inf")
-    child = None
-    move = None
-    for mv, child_state in st.next_states(state, opponent=False):
-        score, came_from = min_value(child_state, depth - 1, ev, alpha, beta)
         if score > v:
             v = score
-            child = came_from
-            move = mv
 
         if v >= beta:
-            return v, move
+            break
         alpha = max(alpha, v)
-    return v, move
 
+    return v
 
-def min_value(state, depth, ev, alpha, beta):
-    if depth == 0 or st.is_gameover(state):
-        return ev(state), None
 
-    v = float("inf")
-    move = None
-    child = None
-    for mv, child_state in st.next_states(state, opponent=True):
-        score, came_from = max_value(child_state, depth - 1, ev, alpha, beta)
-        if score < v:
-            v = score
-            child = came_from
-            move = mv
+# Learner variation with logging ----------------------------------- #
+def alpha_beta_search_ml(state, depth, ev, ml_logger, prev_states, engine=st):
+    """ Alpha-beta search which logs the leaf state of the principal variation
+        with ml_logger (for TD-Leaf) """
+    search = Search(expander_for(state, prev_states, engine), static_leaf(ev), capture=True)
+    v, mv, pred_state = search_root(state, depth, search)
+    ml_logger.add(engine.to_array(pred_state))
+    return mv
 
-        if v <= alpha:
-            return v, move
-        beta = min(beta, v)
 
-    return v, move
+# Standard best player variation -------------------------------------- #
+def alpha_beta_search_learned(state, depth, ev, prev_states, engine=st, stats=None, memory=None, batch_ev=None):
+    """ Alpha-beta search with a static evaluation at the leaves.
+
+        Args:
+            state: the board state, with the player to move
+            depth: the search depth
+            ev: the evaluation function
+            prev_states: keys of states which are not to be generated
+            engine: the board engine of state (see bitboard.py)
+            stats: an optional SearchStats
+            memory: an optional reuse.SearchMemory, kept between searches. 
+            Actions found best by earlier searches are tried first, and if the
+            score of state is remembered the root is searched with an 
+            aspiration window around it (see aspiration_search).
+            batch_ev: an optional evaluation function of a 2-D array of boards
+            (e.g. evaluation.reward_batch) agreeing with ev, used to score the
+            children of states with one ply left at once (see frontier). 
+            Ignored by the bitboard engine.
+
+        Returns:
+            The action code of the best action found.
+    """
+    batch = batch_ev if engine is st else None
+    search = Search(expander_for(state, prev_states, engine), static_leaf(ev), stats=stats, memory=memory,
+                    batch=batch)
+
+    guess = None if memory is None else memory.score(engine.key(state, False))
+    if guess is None:
+        v, mv, _ = search_root(state, depth, search)
+    else:
+        v, mv = aspiration_search(state, depth, search, guess, ASPIRATION_WIDTH)
+    return mv
 
 
-# Principle variation seach experiment ---------------------------------------- #
-def principle_variation_search(state, depth, ev, prev_states):
-    expander = lambda s, opponent: st.next_states(s, opponent, avoid=prev_states)
-    _, move = pvs_algorithm(state, depth, -float("inf"), float("inf"), False, ev, expander)
+def alpha_beta_search_inplace(state, depth, ev, prev_states, batch_ev=None, incremental=None):
+    """ The same search as alpha_beta_search_learned (with the state engine) 
+        except that children are generated by modifying a single board in 
+        place, so no boards are allocated during the search (other than by
+        batch_ev, see alpha_beta_search_learned).
 
-    if move is None:
-        print("oh no!")
+        If incremental (an evaluation.IncrementalReward) is given it is kept
+        up to date with the searched board, and ev must be incremental itself
+        (or call it, as the timed evaluation of iterative_deepening does).
+    """
+    search = Search(expander_for(state, prev_states, inplace=True, tracker=incremental), static_leaf(ev),
+                    batch=batch_ev)
+    v, mv, _ = search_root(state, depth, search)
+    return mv
 
-    return move
 
+# Transposition table search ----------------------------------------------- #
+def _tt_search(state, ev, prev_states, table, ordering, quiesce, stats, tablebase, reductions, futility,
+               batch_ev):
+    """ The Search of alpha_beta_search_tt and mtdf (see their arguments) """
+    leaf = quiescence_leaf(ev) if quiesce else static_leaf(ev)
+    static = static_leaf(ev)
+    if tablebase is not None:
+        leaf = tablebase_leaf(tablebase, leaf)
+        # the exact score of a state in the tablebase bounds its children
+        static = tablebase_leaf(tablebase, static)
+
+    # leaves are only scored in batches by the evaluation function
+    batch = batch_ev if not quiesce and tablebase is None else None
+
+    return Search(expander_for(state, prev_states, inplace=True), leaf, table, ordering, stats,
+                  reductions=reductions, futility=static if futility else None, batch=batch)
+
+
+def alpha_beta_search_tt(state, depth, ev, prev_states, table, ordering=None, quiesce=False, stats=None,
+                        tablebase=None, reductions=False, futility=False, batch_ev=None):
+    """ Alpha-beta search which stores the result of every searched state in a
+        transposition table, so that states reached by different sequences of
+        actions are only searched once. The table is kept between searches.
+
+        Children are generated in place and keyed incrementally (see 
+        state.action_key).
+
+        Args:
+            state: the board state, with the player to move
+            depth: the search depth
+            ev: the evaluation function
+            prev_states: keys of states which are not to be generated
+            table: a transposition.TranspositionTable
+            ordering: an optional ordering.MoveOrdering used to order the 
+            actions of each state. Otherwise only the table move is tried 
+            first.
+            quiesce: set to True to evaluate the leaves with quiescence
+            stats: an optional SearchStats
+            tablebase: an optional tablebase.Tablebase used to score leaves 
+            exactly (see tablebase_leaf)
+            reductions: set to True to use late move reductions
+            futility: set to True to use futility pruning
+            batch_ev: an optional batched evaluation function (see 
+            alpha_beta_search_learned), used unless quiesce or tablebase is
+            given
+
+        Returns:
+            The action code of the best action found.
+    """
+    search = _tt_search(state, ev, prev_states, table, ordering, quiesce, stats, tablebase, reductions,
+                        futility, batch_ev)
+
+    table.new_search()
+    v, mv, _ = search_root(state, depth, search)
+    return mv
 
-def pvs_algorithm(state, depth, alpha, beta, opponent, ev, expander):
-    if depth == 0 or st.is_gameover(state):
-        sgn = -1 if opponent else 1
-        return sgn * ev(state), None
 
-    is_first = True
-    move = None
-    for mv, child in expander(state, opponent):
+# MTD(f) ------------------------------------------------------------------- #
+def mtdf(state, depth, ev, prev_states, table, ordering=None, quiesce=False, stats=None, tablebase=None,
+         reductions=False, futility=False, batch_ev=None):
+    """ MTD(f) search: finds the minimax value with a sequence of null window
+        alpha-beta searches (probes), each of which tells whether the value is
+        above or below a guess. The transposition table keeps the results of 
+        earlier probes, so each probe only searches what has changed.
+
+        The first guess is the value stored for state in the table (e.g. by
+        the previous iteration of iterative deepening), otherwise zero.
+
+        Args:
+            state: the board state, with the player to move
+            depth: the search depth
+            ev: the evaluation function
+            prev_states: keys of states which are not to be generated
+            table: a transposition.TranspositionTable
+            ordering: an optional ordering.MoveOrdering
+            quiesce: set to True to evaluate the leaves with quiescence
+            stats: an optional SearchStats
+            tablebase: an optional tablebase.Tablebase used to score leaves 
+            exactly (see tablebase_leaf)
+            reductions: set to True to use late move reductions
+            futility: set to True to use futility pruning
+            batch_ev: an optional batched evaluation function (see 
+            alpha_beta_search_learned), used unless quiesce or tablebase is
+            given
+
+        Returns:
+            The action code of the best action found.
+    """
+    search = _tt_search(state, ev, prev_states, table, ordering, quiesce, stats, tablebase, reductions,
+                        futility, batch_ev)
+
+    table.new_search()
+    entry = table.probe(st.zobrist(state))
+    g = entry[2] if entry is not None and abs(entry[2]) != float("inf") else 0.0
+
+    lower = -float("inf")
+    upper = float("inf")
+    best = None
+
+    # stop once the bounds are within NULL_WINDOW (since the windows cannot 
+    # separate them further)
+    while upper - lower > NULL_WINDOW:
+
+        # the null window (beta - NULL_WINDOW, beta) just above the last 
+        # lower bound found, or at the guess
+        beta = max(g, lower + NULL_WINDOW)
+        g, mv, _ = search_root(state, depth, search, beta - NULL_WINDOW, beta)
+
+        if g < beta:
+            upper = g
+        else:
+            lower = g
+            best = mv
+
+        if mv is None:
+            return None
+
+    # if no probe failed high every action is as bad as the last one found
+    return best if best is not None else mv
+
+
+# Iterative deepening ------------------------------------------------------ #
+def iterative_deepening(search, state, ev, max_depth, deadline, stats=None, clock=time.process_time, **kwargs):
+    """ Repeatedly calls search with increasing depth until max_depth is 
+        reached or the time runs out.
+
+        The search is aborted (by raising SearchTimeout from the evaluation 
+        function) when time.process_time passes deadline, in which case the 
+        result of the deepest completed search is returned. The search at depth
+        1 is always completed.
+
+        Args:
+            search: a callable search(state, depth, ev, **kwargs) returning an
+            action code, e.g. alpha_beta_search_tt
+            state: the board state
+            ev: the evaluation function
+            max_depth: the largest depth to search to
+            deadline: the value of time.process_time by which to finish
+            stats: an optional SearchStats, passed to search, which also 
+            records each iteration
+            clock: the clock used to time the iterations when deciding whether
+            to start the next one. Searches run by other processes (see 
+            parallel.py) barely use the CPU time of this one, so are timed by
+            the wall clock (time.monotonic) instead
+            kwargs: passed to search. A batch_ev argument is timed as ev is
+
+        Returns:
+            A tuple (move, depth) where move is the action code found by the 
+            deepest completed search and depth is its depth.
+    """
+    def timed(f):
+        def timed_f(s):
+            if time.process_time() > deadline:
+                raise SearchTimeout()
+            return f(s)
+        return timed_f
+
+    if stats is not None:
+        kwargs["stats"] = stats
+
+    # a batched evaluation function is timed in the same way
+    timed_ev = timed(ev)
+    timed_kwargs = dict(kwargs)
+    if kwargs.get("batch_ev") is not None:
+        timed_kwargs["batch_ev"] = timed(kwargs["batch_ev"])
+
+    # the deadline on clock
+    limit = clock() + deadline - time.process_time()
+
+    t0 = clock()
+    if stats is not None:
+        stats.start_iteration(1)
+    move = search(state, 1, ev, **kwargs)
+    depth = 1
+    if stats is not None:
+        stats.end_iteration()
+
+    for d in range(2, max_depth + 1):
+
+        # dont start an iteration which is unlikely to finish, judging by the 
+        # time the previous one took
+        previous = clock() - t0
+        t0 = clock()
+        if (limit - t0) < MIN_ITERATION_RATIO * previous:
+            break
 
-        if is_first:
-            score, _ = pvs_algorithm(child, depth - 1, -beta, -alpha, not opponent, ev, expander)
-            score = -score
+        if stats is not None:
+            stats.start_iteration(d)
+        try:
+            move = search(state, d, timed_ev, **timed_kwargs)
+        except SearchTimeout:
+            if stats is not None:
+                stats.end_iteration(completed=False)
+            break
+        depth = d
+        if stats is not None:
+            stats.end_iteration()
 
-            is_first = False
-        else:
-            score, _ = pvs_algorithm(child, depth - 1, -alpha - 1, -alpha, not opponent, ev, expander)
-            score = -score
+    return move, depth
 
-            if alpha < score < beta:
-                score, _ = pvs_algorithm(child, depth - 1, -beta, -score, not opponent, ev, expander)
-                score = -score
 
-        if score > alpha:
-            alpha = score
-            move = mv
+# Implementation for moderate player ------------------------------------------ #
+def alpha_beta_search(state, depth, ev):
+    search = Search(Expander(st), static_leaf(ev))
+    v, mv, _ = search_root(state, depth, search)
+    return mv
 
-        if alpha >= beta:
-            break
 
-    return alpha, move
+# Principle variation seach experiment ---------------------------------------- #
+class Aspiration:
+    """ The score of the last principal variation search, used to centre the 
+        aspiration window of the next one. Kept between the iterations of 
+        iterative deepening and between moves.
+
+        Attributes:
+            score: the score of the last search, or None before the first
+            width: the half width of the first window
+    """
+
+    def __init__(self, width=ASPIRATION_WIDTH):
+        self.width = width
+        self.score = None
+
+    def clear(self):
+        self.score = None
+
+
+def principle_variation_search(state, depth, ev, prev_states, aspiration=None, stats=None):
+    """ Principal variation search: all but the first action of each state are
+        searched with a null window, and only searched fully if they turn out
+        to be better.
+
+        Args:
+            state: the board state, with the player to move
+            depth: the search depth
+            ev: the evaluation function
+            prev_states: keys of states which are not to be generated
+            aspiration: an optional Aspiration. If it holds a score the root 
+            is searched with an aspiration window around it (see 
+            aspiration_search), and the score found is stored in it.
+            stats: an optional SearchStats
+
+        Returns:
+            The action code of the best action found.
+    """
+    search = Search(Expander(st, prev_states), static_leaf(ev), stats=stats, pvs=True)
+
+    if aspiration is None or aspiration.score is None:
+        v, mv, _ = search_root(state, depth, search)
+    else:
+        v, mv = aspiration_search(state, depth, search, aspiration.score, aspiration.width)
+
+    if aspiration is not None:
+        aspiration.score = v
+    return mv
+
+
+def aspiration_search(state, depth, search, guess, width):
+    """ Searches the root with the window (guess - width, guess + width). If 
+        the score falls outside the window the search is repeated with the 
+        failing side of the window moved past the score, ASPIRATION_GROWTH 
+        times further each time, until the score is inside the window.
+
+        Returns:
+            A tuple (value, move) as in search_root.
+    """
+    alpha = guess - width
+    beta = guess + width
+    while True:
+        v, mv, _ = search_root(state, depth, search, alpha, beta)
+
+        if v <= alpha and alpha != -float("inf"):
+            alpha = v - width
+        elif v >= beta and beta != float("inf"):
+            beta = v + width
+        else:
+            return v, mv
+
+        width *= ASPIRATION_GROWTH
 
 
 if __name__ == "__main__":
@@ -3,7 +3,9 @@ import random
 from pretty_fly_for_an_AI import state 
 from pretty_fly_for_an_AI.minimax import alpha_beta_search as minimax
 from pretty_fly_for_an_AI.minimax import principle_variation_search as pvs
+from pretty_fly_for_an_AI.minimax import Aspiration, iterative_deepening
 from pretty_fly_for_an_AI.evaluation import reward
+from pretty_fly_for_an_AI.timing import TimeManager
 
 WEIGHTS_FILE = "./pretty_fly_for_an_AI/weights.npy"
 
@@ -20,22 +22,14 @@ class RandomPlayer:
         #pylint: disable=unused-variable
         action_id, next_state = random.choice(list(state.next_states(self.state, opponent=False)))
 
-        return action_id
+        return state.action_name(action_id)
 
     def update(self, color, action):
         
-        action_type, data = action[0], action[1:]
-
         #check if this is an opponents move
         opponent = self.color != color
 
-        if action_type == state.MOVE_ACTION:
-            n, sp, ep = data
-            self.state = state.move(self.state, n, state.ptoi(*sp), state.ptoi(*ep), opponent)
-
-        else:
-            pos = data[0]
-            self.state = state.boom(self.state, state.ptoi(*pos))
+        self.state = state.apply_action(self.state, state.action_code(action), opponent)
 
 # This is a moderate player, its the one we can now beat
 class PlayerModerate:
@@ -75,68 +69,73 @@ class PlayerModerate:
 
     def action(self):
 
-        return minimax(self.state, depth=PlayerModerate.minimax_depth, ev=PlayerModerate.ev)
+        move = minimax(self.state, depth=PlayerModerate.minimax_depth, ev=PlayerModerate.ev)
+        return state.action_name(move)
 
     def update(self, color, action):
 
-        action_type, data = action[0], action[1:]
-
         # check if this is an opponents move
         opponent = self.color != color
 
         self.counter += 1
         print(self.counter)
 
-        if action_type == state.MOVE_ACTION:
-
-            n, sp, ep = data
-            self.state = state.move(self.state, n, state.ptoi(*sp), state.ptoi(*ep), opponent)
-        else:
-
-            pos = data[0]
-            self.state = state.boom(self.state, state.ptoi(*pos))
+        self.state = state.apply_action(self.state, state.action_code(action), opponent)
 
 
 class PvsPlayer:
-    minimax_depth = 3
+    # the deepest search made by iterative deepening
+    max_depth = 4
+
+    # set to False to always search the root with an infinite window
+    aspiration = True
 
     weights = np.load(WEIGHTS_FILE)
 
     ev = lambda state: reward(state, PvsPlayer.weights)
 
     def __init__(self, color):
+        self.clock = TimeManager()
+        with self.clock:
 
-        self.state = state.create_start_state(color)
+            self.state = state.create_start_state(color)
 
-        # Prev states initialised
-        self.prev_states = set()
-        self.prev_states.add(self.state.tobytes())
+            # Prev states initialised (white moves first)
+            self.prev_states = set()
+            self.prev_states.add(state.key(self.state, color == state.BLACK_COLOR))
 
-        self.color = color
+            # the score of the last search, kept between iterations and moves
+            self.window = Aspiration() if self.aspiration else None
+
+            self.color = color
 
 
     def action(self):
-        return pvs(self.state, depth=PvsPlayer.minimax_depth, ev=PvsPlayer.ev,
-                          prev_states=self.prev_states)
+        with self.clock:
+            self.clock.turns += 1
+            deadline = self.clock.deadline(int(np.abs(self.state).sum()))
+            move, _ = iterative_deepening(pvs, self.state, PvsPlayer.ev, self.max_depth, deadline,
+                                          prev_states=self.prev_states, aspiration=self.window)
+            return state.action_name(move)
 
     def update(self, color, action):
+        with self.clock:
+            self._update(color, action)
+
+    def _update(self, color, action):
 
-        action_type, data = action[0], action[1:]
+        action = state.action_code(action)
 
         # check if this is an opponents move
         opponent = self.color != color
 
-        if action_type == state.MOVE_ACTION:
-
-            n, sp, ep = data
-            self.state = state.move(self.state, n, state.ptoi(*sp), state.ptoi(*ep), opponent)
-        else:
+        if state.is_boom(action):
             
             #previous states can now never occur, safe to clear memory
             del self.prev_states
             self.prev_states = set()
 
-            pos = data[0]
-            self.state = state.boom(self.state, state.ptoi(*pos))
+        self.state = state.apply_action(self.state, action, opponent)
 
-        self.prev_states.add(self.state.tobytes())
+        # the other player moves next
+        self.prev_states.add(state.key(self.state, not opponent))
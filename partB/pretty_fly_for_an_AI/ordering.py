@@ -0,0 +1,108 @@
+""" Dynamic move ordering for the alpha-beta searches.
+
+    Actions which caused a cut off elsewhere in the tree are tried early:
+        killer moves: the last KILLERS moves (not booms) which caused a cut off
+        at the same ply of the search.
+        history heuristic: a score for every action code (for each player)
+        which is increased by depth ** 2 whenever the action causes a cut off
+        at that depth.
+
+    Actions are ordered as: the transposition table move, booms (in the order
+    generated), killer moves then the remaining moves by history score. Ties
+    keep the order the actions were generated in.
+"""
+
+import numpy as np
+
+try:
+    from pretty_fly_for_an_AI import state as st
+except ModuleNotFoundError:
+    import state as st
+
+# the number of killer moves kept at each ply
+KILLERS = 2
+
+# the deepest ply for which killer moves are kept
+MAX_PLY = 64
+
+# the number of possible action codes
+NUM_ACTIONS = 1 << 16
+
+
+class MoveOrdering:
+    """ Killer moves and history scores collected during a search, and kept
+        (aged) between searches. """
+
+    def __init__(self):
+        self.killers = [[] for _ in range(MAX_PLY)]
+
+        # history[1] are the scores for the opponents actions
+        self.history = np.zeros((2, NUM_ACTIONS), dtype=np.int64)
+
+    def order(self, actions, ply, opponent, tt_move=None):
+        """ Orders actions so that the most promising are tried first.
+
+            Args:
+                actions: an iterable of action codes
+                ply: the number of actions from the root of the search
+                opponent: set to True if the opponent is making the move
+                tt_move: the best action stored in the transposition table
+
+            Returns:
+                A list of action codes
+        """
+        first = []
+        booms = []
+        moves = []
+        for action in actions:
+            if action == tt_move:
+                first.append(action)
+            elif st.is_boom(action):
+                booms.append(action)
+            else:
+                moves.append(action)
+
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+        killed = [action for action in killers if action in moves]
+        if killed:
+            moves = [action for action in moves if action not in killed]
+
+        if len(moves) > 1:
+            scores = self.history[int(opponent)][moves]
+            if scores.any():
+                moves = [moves[i] for i in np.argsort(-scores, kind="stable")]
+
+        return first + booms + killed + moves
+
+    def cutoff(self, action, ply, depth, opponent):
+        """ Records that action caused a cut off.
+
+            Args:
+                action: the action code
+                ply: the number of actions from the root of the search
+                depth: the remaining search depth when the cut off occurred
+                opponent: set to True if the opponent made the move
+        """
+        self.history[int(opponent), action] += depth * depth
+
+        if st.is_boom(action) or ply >= MAX_PLY:
+            return
+
+        killers = self.killers[ply]
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[KILLERS:]
+
+    def age(self):
+        """ Called between searches (turns). History scores are halved, so
+            that recent cut offs count for more, and killer moves are
+            forgotten since plies are counted from a different root. """
+        self.history >>= 1
+        for killers in self.killers:
+            killers.clear()
+
+    def clear(self):
+        """ Forgets everything """
+        self.history.fill(0)
+        for killers in self.killers:
+            killers.clear()
@@ -0,0 +1,204 @@
+""" Parallel root search over a pool of worker processes.
+
+    The actions at the root are divided between the workers, each of which
+    searches its share with its own transposition table and move ordering
+    (see minimax.alpha_beta_search_tt). The best action is the one with the
+    highest score, ties going to the action generated first, so the result
+    does not depend on the number of workers or on which finishes first.
+
+    If only one core is available no pool is created and the search is made
+    serially in the calling process.
+
+    Time spent by the workers is not counted by time.process_time in the
+    calling process, so workers are timed by the wall clock instead.
+"""
+
+import multiprocessing
+import os
+import time
+
+from pretty_fly_for_an_AI import state as st
+from pretty_fly_for_an_AI import minimax
+from pretty_fly_for_an_AI.evaluation import reward
+from pretty_fly_for_an_AI.ordering import MoveOrdering
+from pretty_fly_for_an_AI.timing import SearchTimeout
+from pretty_fly_for_an_AI.transposition import TranspositionTable, TT_MAX_BYTES
+
+# the search state of a worker process, set by _init_worker
+_worker = {}
+
+
+def _init_worker(weights, quiesce, tt_max_bytes, reductions, futility):
+    _worker["ev"] = lambda s: reward(s, weights)
+    _worker["quiesce"] = quiesce
+    _worker["reductions"] = reductions
+    _worker["futility"] = futility
+    _worker["table"] = TranspositionTable(tt_max_bytes)
+    _worker["ordering"] = MoveOrdering()
+    _worker["root"] = None
+
+
+def _search_share(task):
+    """ Searches a workers share of the root actions.
+
+        Args:
+            task: a tuple (state, share, depth, prev_states, end, deadline) 
+            where share is a list of (index, action code) pairs of the root 
+            actions to search, end is True if the end game move ordering is 
+            used and deadline is the value of time.monotonic by which to 
+            finish (or None)
+
+        Returns:
+            A tuple (value, index) of the best action of the share and its
+            index in the root actions. Index is None if share is empty.
+    """
+    state, share, depth, prev_states, end, deadline = task
+
+    ev = _worker["ev"]
+    if deadline is not None:
+        ev = _timed(ev, deadline, time.monotonic)
+
+    table = _worker["table"]
+    ordering = _worker["ordering"]
+
+    # age the table and the move ordering once per turn
+    z = st.zobrist(state)
+    if z != _worker["root"]:
+        _worker["root"] = z
+        table.new_search()
+        ordering.age()
+
+    leaf = minimax.quiescence_leaf(ev) if _worker["quiesce"] else minimax.static_leaf(ev)
+    futility = minimax.static_leaf(ev) if _worker["futility"] else None
+    search = minimax.Search(minimax.Expander(st, prev_states, end, inplace=True), leaf, table, ordering,
+                            reductions=_worker["reductions"], futility=futility)
+
+    s = state.copy()
+    alpha = -float("inf")
+    v = -float("inf")
+    best = None
+    for index, action in share:
+        child_z = st.action_key(z, s, action, False)
+        record = st.apply_action_inplace(s, action, False)
+        score, _, _ = minimax.negamax(s, depth - 1, -float("inf"), -alpha, True, search, child_z, 1)
+        st.undo(s, record)
+
+        score = -score
+        if score > v:
+            v = score
+            best = index
+        alpha = max(alpha, v)
+
+    return v, best
+
+
+class ParallelSearch:
+    """ Runs alpha_beta_search_tt with the root actions split over a pool of
+        worker processes.
+
+        Attributes:
+            workers: the number of worker processes, or 1 if searching serially
+            pool: the multiprocessing.Pool, or None if searching serially
+    """
+
+    def __init__(self, weights, workers=None, quiesce=False, tt_max_bytes=TT_MAX_BYTES, reductions=False,
+                 futility=False):
+        """
+            Args:
+                weights: the weights of the evaluation function (see
+                evaluation.reward) used by the workers
+                workers: the number of worker processes (default one per core)
+                quiesce: passed to alpha_beta_search_tt
+                tt_max_bytes: the memory cap of the table in each worker
+                reductions, futility: passed to alpha_beta_search_tt
+        """
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.quiesce = quiesce
+        self.reductions = reductions
+        self.futility = futility
+
+        # the last deadline given to search and the corresponding wall clock
+        # deadline given to the workers
+        self._deadline = None
+        self._wall_deadline = None
+
+        self.pool = None
+        if self.workers > 1:
+            self.pool = multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                             initargs=(weights, quiesce, tt_max_bytes, reductions, futility))
+        else:
+            self.workers = 1
+
+            # used for the serial search
+            self.table = TranspositionTable(tt_max_bytes)
+            self.ordering = MoveOrdering()
+
+    def search(self, state, depth, ev, prev_states, deadline=None, stats=None):
+        """ Searches state to depth.
+
+            Args:
+                state: the board state, with the player to move
+                depth: the search depth
+                ev: the evaluation function, only used when searching serially
+                (workers use reward with the weights given to __init__)
+                prev_states: keys of states which are not to be generated
+                deadline: the value of time.process_time by which to finish.
+                Workers are given the same amount of wall clock time from the
+                first call with this deadline, so repeated searches (as in
+                iterative deepening) share it. SearchTimeout is raised if the
+                search does not finish in time.
+                stats: an optional minimax.SearchStats. Only the serial search
+                is counted, since the workers run in other processes.
+
+            Returns:
+                The action code of the best action found.
+        """
+        if self.pool is None:
+            if deadline is not None:
+                ev = _timed(ev, deadline)
+            return minimax.alpha_beta_search_tt(state, depth, ev, prev_states, self.table,
+                                                self.ordering, self.quiesce, stats,
+                                                reductions=self.reductions, futility=self.futility)
+
+        if deadline != self._deadline:
+            self._deadline = deadline
+            if deadline is not None:
+                self._wall_deadline = time.monotonic() + deadline - time.process_time()
+        wall_deadline = None if deadline is None else self._wall_deadline
+
+        end = st.num_stacks(state) < minimax.END_GAME_STACKS
+        if end:
+            actions = list(st.next_actions_end(state, False, avoid=prev_states))
+        else:
+            actions = list(st.next_actions(state, False, avoid=prev_states))
+
+        if not actions:
+            # every action leads to a repeated state (see alpha_beta_search_tt)
+            end = True
+            prev_states = set()
+            actions = list(st.next_actions_end(state, False))
+
+        # deal the actions out in turn, so each worker gets a mix of the
+        # (statically) better and worse actions
+        shares = [list(enumerate(actions))[i::self.workers] for i in range(self.workers)]
+        tasks = [(state, share, depth, prev_states, end, wall_deadline) for share in shares]
+
+        results = self.pool.map(_search_share, tasks)
+
+        # highest value, then lowest index (the same as a serial search)
+        _, neg_index = max((v, -i) for v, i in results if i is not None)
+        return actions[-neg_index]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+
+def _timed(ev, deadline, clock=time.process_time):
+    """ Wraps ev so that SearchTimeout is raised once clock passes deadline """
+    def timed_ev(s):
+        if clock() > deadline:
+            raise SearchTimeout()
+        return ev(s)
+    return timed_ev
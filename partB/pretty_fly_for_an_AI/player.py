@@ -1,13 +1,30 @@
+import json
+import os
+import time
+import uuid
+
 import numpy as np
 from pretty_fly_for_an_AI import state
+from pretty_fly_for_an_AI import bitboard
+from pretty_fly_for_an_AI import book
 
 from pretty_fly_for_an_AI.minimax import alpha_beta_search_learned as minimax_learned
+from pretty_fly_for_an_AI.minimax import alpha_beta_search_tt as minimax_tt
 from pretty_fly_for_an_AI.minimax import alpha_beta_search_ml as minimax_ml
+from pretty_fly_for_an_AI.minimax import iterative_deepening
+from pretty_fly_for_an_AI.minimax import mtdf
+from pretty_fly_for_an_AI.minimax import SearchStats
 
 from pretty_fly_for_an_AI.state_logging import StateLogger
-from pretty_fly_for_an_AI.evaluation import reward
-
-import time
+from pretty_fly_for_an_AI.evaluation import reward, reward_batch, reward_totals
+from pretty_fly_for_an_AI.transposition import TranspositionTable
+from pretty_fly_for_an_AI.ordering import MoveOrdering
+from pretty_fly_for_an_AI.reuse import SearchMemory
+from pretty_fly_for_an_AI.parallel import ParallelSearch
+from pretty_fly_for_an_AI.ponder import Ponderer
+from pretty_fly_for_an_AI.tablebase import Tablebase, TABLEBASE_FILE
+from pretty_fly_for_an_AI.book import BOOK_FILE
+from pretty_fly_for_an_AI.timing import TimeManager
 
 # weights for learning (can change)
 WEIGHTS_W = "./pretty_fly_for_an_AI/weights_w.npy"
@@ -20,12 +37,56 @@ LEARNED_WEIGHTS_BLACK = "./pretty_fly_for_an_AI/weights_learned_b.npy"
 BLACK_COLOR = "black"
 WHITE_COLOR = "white"
 
-# time budget to use before decreasing minimax depth
-TIME_THRESHOLD = 55
+# the searches which can be selected with Player.algorithm (used with the state
+# engine, when searching serially)
+ALGORITHMS = {
+    "alpha_beta": minimax_tt,
+    "mtdf": mtdf,
+}
 
 
 class Player:
-    minimax_depth = 3
+    # the deepest search made (if there is time)
+    max_depth = 8
+
+    # the search used, from ALGORITHMS
+    algorithm = "alpha_beta"
+
+    # whether to continue the search along booms at the leaves (see 
+    # minimax.quiescence)
+    quiesce = True
+
+    # whether to search late quiet actions to a reduced depth first, and to 
+    # skip quiet actions near the horizon which cannot raise alpha (see 
+    # minimax.negamax). Used with the state engine
+    reductions = False
+    futility = False
+
+    # the number of processes to search with. The root actions are split 
+    # between them (see parallel.py) if there is more than one
+    workers = 1
+
+    # the board engine used to represent states (state or bitboard)
+    engine = state
+
+    # memory cap of the transposition table (used with the state engine)
+    tt_max_bytes = 8 * 1024 ** 2
+
+    # the endgame tablebase (see tablebase.py), used if the file exists
+    tablebase_file = TABLEBASE_FILE
+
+    # whether to search on the opponents time, in a worker process sharing the
+    # transposition table (see ponder.py). Only used when searching serially 
+    # with the state engine
+    ponder = False
+
+    # if set, a JSON line describing the search (see minimax.SearchStats) is 
+    # appended to this file for every move
+    trace = os.environ.get("SEARCH_TRACE")
+
+    # identifies the game in search traces. match.py sets the same id for both
+    # players of a game, otherwise each player creates its own in __init__
+    game_id = None
 
     # allow for different weights when white or black
     weights_white = np.load(LEARNED_WEIGHTS)
@@ -35,93 +96,189 @@ class Player:
     ev_white = lambda state: reward(state, Player.weights_white)
     ev_black = lambda state: reward(state, Player.weights_black)
 
-    # Same expansion for black and white
-    expander = lambda s, opponent, avoid=dict(): state.next_states(s, opponent, avoid=avoid)
-
-    # opening moves
-    moves_w = [("MOVE", 1, (0, 1), (1, 1)), ("MOVE", 2, (1, 1), (3, 1)), ("MOVE", 3, (3, 1), (4, 1))]
-    moves_b = [("MOVE", 1, (3, 6), (3, 7)), ("MOVE", 1, (4, 6), (4, 7))]
+    # the opening book (see book.py), used if the file exists
+    book_file = BOOK_FILE
 
     def __init__(self, color):
 
-        self.state = state.create_start_state(color)
-        self.counter = 0
+        # the referee times __init__ too
+        self.clock = TimeManager()
+        with self.clock:
+            self._init(color)
+
+    def _init(self, color):
 
-        # Prev states initialised
+        self.state = self.engine.create_start_state(color)
+
+        # Prev states initialised (white moves first)
         self.prev_states = set()
-        self.prev_states.add(self.state.tobytes())
+        self.prev_states.add(self.engine.key(self.state, color == BLACK_COLOR))
+
+        ponder = self.ponder and self.engine is state and self.workers <= 1
 
-        self.timer = 0
+        # kept between moves, since many states are searched again
+        self.table = TranspositionTable(self.tt_max_bytes, ponder) if self.engine is state else None
+        self.ordering = MoveOrdering() if self.engine is state else None
 
-        self.minimax_depth = Player.minimax_depth
+        # what the previous search found (see reuse.py). The transposition 
+        # table is used for this with the state engine
+        self.memory = SearchMemory() if self.engine is not state else None
 
-        self.expander = Player.expander
+        # only collected when tracing
+        self.stats = SearchStats() if self.trace else None
+        if self.trace and self.game_id is None:
+            self.game_id = uuid.uuid4().hex
 
         self.color = color
         if color == BLACK_COLOR:
-            self.ev = Player.ev_black
-            self.moves = Player.moves_b
+            ev = Player.ev_black
+            weights = Player.weights_black
         else:
-            self.ev = Player.ev_white
-            self.moves = Player.moves_w
-
-    def action(self):
+            ev = Player.ev_white
+            weights = Player.weights_white
+
+        # the worker pool is created once, here
+        self.parallel = None
+        if self.engine is state and self.workers > 1:
+            self.parallel = ParallelSearch(weights, self.workers, self.quiesce, self.tt_max_bytes,
+                                           self.reductions, self.futility)
+
+        self.book = {}
+        if self.book_file is not None and os.path.exists(self.book_file):
+            self.book = book.load(self.book_file)
+
+        self.tablebase = None
+        if self.tablebase_file is not None and os.path.exists(self.tablebase_file):
+            self.tablebase = Tablebase(self.tablebase_file)
+
+        self.ponderer = None
+        if ponder:
+            self.ponderer = Ponderer(weights, self.table, self.quiesce, self.max_depth)
+
+        # the evaluation function is defined on state arrays. Bitboards are 
+        # scored from their totals instead, which is the same without 
+        # converting them back to arrays
+        if self.engine is state:
+            self.ev = ev
+        else:
+            self.ev = lambda s: reward_totals(self.engine.totals(s), weights)
 
-        t0 = time.time()
-        if self.moves:
-            return self.moves.pop(0)
+        # scores the leaves of the search in batches, when they are not 
+        # scored by quiescence search (see minimax.frontier)
+        self.batch_ev = lambda boards: reward_batch(boards, weights)
 
-        move = minimax_learned(self.state, depth=self.minimax_depth, ev=self.ev,
-                               prev_states=self.prev_states, expan=self.expander)
-        t1 = time.time()
-        self.timer += (t1 - t0)
-        return move
+    def action(self):
+        with self.clock:
+            self.clock.turns += 1
+
+            board = self.engine.to_array(self.state)
+            num_tokens = int(np.abs(board).sum())
+
+            # the keys of the bitboard engine are not Zobrist keys
+            avoid = self.prev_states if self.engine is state else ()
+
+            move = book.probe(self.book, board, avoid)
+            if move is not None:
+                action = state.action_name(move)
+                if self.trace:
+                    self._trace(action, book=True)
+                return action
+
+            # play endings perfectly without searching
+            if self.tablebase is not None and num_tokens <= self.tablebase.max_tokens:
+                move = self.tablebase.best_action(board, avoid)
+                if move is not None:
+                    action = state.action_name(move)
+                    if self.trace:
+                        self._trace(action, tablebase=True)
+                    return action
+
+            deadline = self.clock.deadline(num_tokens)
+            start = time.process_time()
+
+            if self.stats is not None:
+                self.stats.clear()
+
+            if self.parallel is not None:
+                # depth 1 must always finish (see iterative_deepening)
+                search = lambda s, depth, ev, **kwargs: self.parallel.search(
+                    s, depth, ev, deadline=deadline if depth > 1 else None, **kwargs)
+                move, depth = iterative_deepening(search, self.state, self.ev, self.max_depth, deadline,
+                                                  self.stats, clock=time.monotonic,
+                                                  prev_states=self.prev_states)
+            elif self.engine is state:
+                self.ordering.age()
+                move, depth = iterative_deepening(ALGORITHMS[self.algorithm], self.state, self.ev,
+                                                  self.max_depth, deadline, self.stats,
+                                                  prev_states=self.prev_states, table=self.table,
+                                                  ordering=self.ordering, quiesce=self.quiesce,
+                                                  tablebase=self.tablebase, reductions=self.reductions,
+                                                  futility=self.futility, batch_ev=self.batch_ev)
+            else:
+                self.memory.new_search()
+                move, depth = iterative_deepening(minimax_learned, self.state, self.ev, self.max_depth, deadline,
+                                                  self.stats, prev_states=self.prev_states, engine=self.engine,
+                                                  memory=self.memory)
+
+            action = state.action_name(move)
+            if self.trace:
+                self._trace(action, depth=depth, tokens=num_tokens, budget=deadline - start,
+                            seconds=time.process_time() - start)
+            return action
+
+    def _trace(self, action, **fields):
+        """ Appends a JSON line describing the move to the trace file """
+        record = {"game": self.game_id, "color": self.color, "turn": self.clock.turns, "action": action,
+                  "used": self.clock.used, **fields}
+        if self.ponderer is not None:
+            record["ponder_hits"] = self.ponderer.hits
+        if self.stats is not None and not (fields.get("book") or fields.get("tablebase")):
+            record.update(self.stats.to_dict())
+
+        with open(self.trace, "a") as fp:
+            fp.write(json.dumps(record) + "\n")
 
     def update(self, color, action):
+        with self.clock:
+            self._update(color, action)
+
+    def _update(self, color, action):
 
-        action_type, data = action[0], action[1:]
+        action = state.action_code(action)
 
         # check if this is an opponents move
         opponent = self.color != color
 
-        self.counter += 1
-
-        if action_type == state.MOVE_ACTION:
+        # the table is not shared while searching
+        if self.ponderer is not None:
+            self.ponderer.stop(action if opponent else None)
 
-            n, sp, ep = data
-            self.state = state.move(self.state, n, state.ptoi(*sp), state.ptoi(*ep), opponent)
-        else:
+        if state.is_boom(action):
 
             # previous states can now never occur, safe to clear memory
             del self.prev_states
             self.prev_states = set()
+            if self.memory is not None:
+                self.memory.clear()
 
-            pos = data[0]
-            self.state = state.boom(self.state, state.ptoi(*pos))
+        self.state = self.engine.apply_action(self.state, action, opponent)
 
-        # branching conditions in the opening book
-        if self.counter == 5 and self.color == BLACK_COLOR:
-            if self.state[44] == -2 or self.state[12] == -4 or self.state[14] == -4 or self.state[15] == -4:
-                self.moves.append(("MOVE", 1, (1, 6), (1, 7)))
-                self.moves.append(("MOVE", 2, (3, 7), (1, 7)))
-            else:
-                self.moves.append(("MOVE", 1, (6, 6), (6, 7)))
-                self.moves.append(("MOVE", 2, (4, 7), (6, 7)))
+        # the other player moves next
+        self.prev_states.add(self.engine.key(self.state, not opponent))
 
-        self.prev_states.add(self.state.tobytes())
-        if self.timer >= TIME_THRESHOLD:
-            self.minimax_depth = 1
+        if self.ponderer is not None and not opponent:
+            self.ponderer.start(self.state, self.prev_states)
 
 
 class LearnerPlayer:
     minimax_depth = 3
 
+    # the board engine used to represent states (state or bitboard)
+    engine = state
+
     weights_w = np.load(WEIGHTS_W)
     weights_b = np.load(WEIGHTS_B)
 
-    expander_w = lambda s, opponent, avoid=dict(): state.next_states(s, opponent, avoid=avoid)
-    expander_b = lambda s, opponent, avoid=dict(): state.next_states(s, opponent, avoid=avoid)
-
     moves_w = [("MOVE", 1, (0, 1), (1, 1)), ("MOVE", 2, (1, 1), (3, 1)), ("MOVE", 3, (3, 1), (4, 1))]
     moves_b = [("MOVE", 1, (3, 6), (3, 7)), ("MOVE", 1, (4, 6), (4, 7))]
 
@@ -130,64 +287,89 @@ class LearnerPlayer:
 
     def __init__(self, color):
 
-        self.state = state.create_start_state(color)
+        self.state = self.engine.create_start_state(color)
 
-        # Prev states initialised
+        # Prev states initialised (white moves first)
         self.prev_states = set()
-        self.prev_states.add(self.state.tobytes())
+        self.prev_states.add(self.engine.key(self.state, color == BLACK_COLOR))
         self.counter = 0
         self.logger = StateLogger()
 
         self.color = color
         if color == BLACK_COLOR:
-            self.expander = LearnerPlayer.expander_b
-            self.ev = LearnerPlayer.ev_b
+            ev = LearnerPlayer.ev_b
+            weights = LearnerPlayer.weights_b
             self.moves = LearnerPlayer.moves_b
         else:
-            self.expander = LearnerPlayer.expander_w
-            self.ev = LearnerPlayer.ev_w
+            ev = LearnerPlayer.ev_w
+            weights = LearnerPlayer.weights_w
             self.moves = LearnerPlayer.moves_w
 
+        # the evaluation function is defined on state arrays (see Player)
+        if self.engine is state:
+            self.ev = ev
+        else:
+            self.ev = lambda s: reward_totals(self.engine.totals(s), weights)
+
         with open("./pretty_fly_for_an_AI/ml_logging/color.color", "w") as fp:
             fp.write(color)
 
     def action(self):
         if self.moves:
             return self.moves.pop(0)
-        return minimax_ml(self.state, depth=LearnerPlayer.minimax_depth, ev=self.ev, ml_logger=self.logger,
-                          prev_states=self.prev_states, expan=self.expander)
+        move = minimax_ml(self.state, depth=LearnerPlayer.minimax_depth, ev=self.ev, ml_logger=self.logger,
+                          prev_states=self.prev_states, engine=self.engine)
+        return state.action_name(move)
 
     def update(self, color, action):
 
-        action_type, data = action[0], action[1:]
+        action = state.action_code(action)
 
         # check if this is an opponents move
         opponent = self.color != color
 
         self.counter += 1
 
-        if action_type == state.MOVE_ACTION:
-
-            n, sp, ep = data
-            self.state = state.move(self.state, n, state.ptoi(*sp), state.ptoi(*ep), opponent)
-        else:
+        if state.is_boom(action):
 
             # previous states can now never occur, safe to clear memory
             del self.prev_states
             self.prev_states = set()
 
-            pos = data[0]
-            self.state = state.boom(self.state, state.ptoi(*pos))
+        self.state = self.engine.apply_action(self.state, action, opponent)
 
         if self.counter == 5 and self.color == BLACK_COLOR:
-            if self.state[44] == -2 or self.state[12] == -4 or self.state[14] == -4 or self.state[15] == -4:
+            board = self.engine.to_array(self.state)
+            if board[44] == -2 or board[12] == -4 or board[14] == -4 or board[15] == -4:
                 self.moves.append(("MOVE", 1, (1, 6), (1, 7)))
                 self.moves.append(("MOVE", 2, (3, 7), (1, 7)))
             else:
                 self.moves.append(("MOVE", 1, (6, 6), (6, 7)))
                 self.moves.append(("MOVE", 2, (4, 7), (6, 7)))
 
-        self.prev_states.add(self.state.tobytes())
+        # the other player moves next
+        self.prev_states.add(self.engine.key(self.state, not opponent))
+
+
+class BitboardPlayer(Player):
+    """ Player using the bitboard engine (see bitboard.py) """
+    engine = bitboard
+
+
+class PrunedPlayer(Player):
+    """ Player using late move reductions and futility pruning """
+    reductions = True
+    futility = True
+
+
+class ParallelPlayer(Player):
+    """ Player searching with a worker process per core (see parallel.py).
+
+        The memory of the worker processes counts towards the referee's space
+        limit, which the pool exceeds, so this is for use outside the referee
+        (e.g. with match.py).
+    """
+    workers = os.cpu_count() or 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+""" Searching on the opponents time (pondering).
+
+    After the player moves, a worker process guesses the opponents reply (the
+    best reply found by the players own search) and searches the position it
+    would lead to with iterative deepening, storing the results in the players
+    transposition table, which is allocated in shared memory. If the opponent
+    makes the guessed move the players next search finds most of its states in
+    the table already. Otherwise the entries are of little use, but nothing is
+    lost except the work of the worker.
+
+    Time spent by the worker is not counted by time.process_time in the
+    calling process. Pondering is stopped before the player next uses the
+    table, since entries are written without locking.
+"""
+
+import multiprocessing
+
+from pretty_fly_for_an_AI import state as st
+from pretty_fly_for_an_AI import minimax
+from pretty_fly_for_an_AI.evaluation import reward
+from pretty_fly_for_an_AI.ordering import MoveOrdering
+from pretty_fly_for_an_AI.timing import SearchTimeout
+
+# the longest to wait (in seconds) for the worker to stop before giving up on
+# it. The worker checks whether to stop at every evaluation, so it normally
+# stops within a millisecond
+STOP_TIMEOUT = 1.0
+
+
+def _ponder(weights, table, quiesce, max_depth, tasks, stop, idle):
+    """ The worker process: searches each position received from tasks until
+        max_depth is reached or stop is set, then sets idle.
+
+        Args:
+            weights: the weights of the evaluation function
+            table: the shared transposition.TranspositionTable
+            quiesce: passed to alpha_beta_search_tt
+            max_depth: the deepest search to make
+            tasks: a queue of tuples (state, prev_states), or None to exit
+            stop: an Event set when the search is to stop
+            idle: an Event set by the worker when it is not searching
+    """
+    ordering = MoveOrdering()
+
+    def ev(s):
+        if stop.is_set():
+            raise SearchTimeout()
+        return reward(s, weights)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        state, prev_states = task
+        ordering.age()
+        try:
+            for depth in range(1, max_depth + 1):
+                minimax.alpha_beta_search_tt(state, depth, ev, prev_states, table, ordering, quiesce)
+                if stop.is_set():
+                    break
+        except SearchTimeout:
+            pass
+        idle.set()
+
+
+class Ponderer:
+    """ Runs searches of positions on the opponents time in a worker process.
+
+        Attributes:
+            guess: the guessed opponents action code (with the opponent to
+            move) of the current or last search, or None
+            searched: the number of positions searched
+            hits: the number of times the opponent made the guessed move
+    """
+
+    def __init__(self, weights, table, quiesce=False, max_depth=8):
+        """
+            Args:
+                weights: the weights of the evaluation function (see
+                evaluation.reward) used by the worker
+                table: the transposition.TranspositionTable shared with the
+                worker, which must be created with shared=True
+                quiesce: passed to alpha_beta_search_tt
+                max_depth: the deepest search made by the worker
+        """
+        self.table = table
+        self.guess = None
+        self.searched = 0
+        self.hits = 0
+
+        self._tasks = multiprocessing.SimpleQueue()
+        self._stop = multiprocessing.Event()
+        self._idle = multiprocessing.Event()
+        self._idle.set()
+
+        self.process = multiprocessing.Process(target=_ponder, daemon=True,
+                                               args=(weights, table, quiesce, max_depth, self._tasks,
+                                                     self._stop, self._idle))
+        self.process.start()
+
+    def start(self, state, prev_states):
+        """ Guesses the opponents reply and starts searching the result.
+
+            Args:
+                state: the board state just after the players move, with the
+                opponent to move
+                prev_states: keys of states which are not to be generated
+        """
+        self.guess = None
+        if self.process is None or st.is_gameover(state):
+            return
+
+        # the best reply found by the players search
+        entry = self.table.probe(st.zobrist(state, True))
+        if entry is None or entry[3] is None:
+            return
+        self.guess = entry[3]
+
+        predicted = st.apply_action(state, self.guess, True)
+        if st.is_gameover(predicted):
+            return
+
+        # the states avoided by the players next search (see Player.update)
+        prev_states = set() if st.is_boom(self.guess) else set(prev_states)
+        prev_states.add(st.key(predicted))
+
+        self._stop.clear()
+        self._idle.clear()
+        self._tasks.put((predicted, prev_states))
+        self.searched += 1
+
+    def stop(self, action=None):
+        """ Stops the search, returning once the worker has stopped using the
+            table.
+
+            Args:
+                action: the opponents action code, used to count hits
+        """
+        if action is not None and action == self.guess:
+            self.hits += 1
+        self.guess = None
+
+        if self.process is None:
+            return
+
+        self._stop.set()
+        if not self._idle.wait(STOP_TIMEOUT):
+            # the table may have been left with a partly written entry
+            self.close()
+            self.table.clear()
+
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process = None
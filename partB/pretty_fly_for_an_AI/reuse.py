@@ -0,0 +1,107 @@
+""" Reuse of the previous search in the next one.
+
+    Two plies after a search, the new root was searched as a node on (or near)
+    the principal variation of the previous search. A SearchMemory keeps, by
+    position key (see state.key), what the searches found near their roots:
+        roots: the actions of each searched root, ordered by their scores
+        entries: the best action, exact score and depth of every state within
+        MEMORY_PLIES of the root whose score was exact (the principal
+        variation and its alternatives)
+    The next search tries the remembered actions first, and its root window is
+    centred on the remembered score of the root (see minimax.aspiration_search).
+
+    Only the last two searches are kept, and at most MAX_ENTRIES states, so the
+    memory stays small. It is cleared after a boom, since none of the states
+    remembered can occur again.
+"""
+
+# the states recorded are those within this many actions of the root
+MEMORY_PLIES = 4
+
+# the maximum number of states remembered (including roots)
+MAX_ENTRIES = 4096
+
+
+class SearchMemory:
+    """ The root action orders and exact scores of recent searches.
+
+        Attributes:
+            roots: a dictionary mapping the key of a root to (age, actions)
+            entries: a dictionary mapping the key of a state to (age, move,
+            value, depth)
+            age: the number of times age has been called
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.roots = {}
+        self.entries = {}
+        self.age = 0
+
+    def order(self, key, actions):
+        """ Orders actions so that those of the last search of key are tried
+            first: all in their remembered order if key was a root, otherwise
+            the best action.
+
+            Args:
+                key: the key of the state
+                actions: an iterable of the action codes of the state
+
+            Returns:
+                A list of action codes
+        """
+        actions = list(actions)
+        if key in self.roots:
+            first = [action for action in self.roots[key][1] if action in actions]
+        elif key in self.entries and self.entries[key][1] in actions:
+            first = [self.entries[key][1]]
+        else:
+            return actions
+
+        remembered = set(first)
+        return first + [action for action in actions if action not in remembered]
+
+    def score(self, key):
+        """ The exact score of the state with key from the player to move, or
+            None if it is not remembered """
+        entry = self.entries.get(key)
+        return None if entry is None else entry[2]
+
+    def store(self, key, move, value, depth):
+        """ Records the exact score of a state searched to depth, unless a
+            deeper search of it in the current search is remembered """
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == self.age and entry[3] > depth:
+            return
+        self.entries[key] = (self.age, move, value, depth)
+        self._bound(self.entries)
+
+    def store_root(self, key, scores):
+        """ Records the actions of a root.
+
+            Args:
+                key: the key of the root
+                scores: a list of (score, action code) pairs in the order
+                searched
+        """
+        # stable, so equal scores keep the searched order
+        actions = [action for _, action in sorted(scores, key=lambda pair: -pair[0])]
+        self.roots[key] = (self.age, actions)
+        self._bound(self.roots)
+
+    def _bound(self, records):
+        """ Forgets the oldest records beyond max_entries """
+        while len(self.roots) + len(self.entries) > self.max_entries and records:
+            del records[next(iter(records))]
+
+    def new_search(self):
+        """ Called before each turns search. Forgets everything from before
+            the previous search """
+        self.age += 1
+        self.roots = {k: v for k, v in self.roots.items() if v[0] >= self.age - 1}
+        self.entries = {k: v for k, v in self.entries.items() if v[0] >= self.age - 1}
+
+    def clear(self):
+        """ Forgets everything """
+        self.roots.clear()
+        self.entries.clear()
@@ -1,6 +1,15 @@
 import numpy as np
 from math import ceil
 import itertools
+import functools
+
+#required since this module is imported in different ways when learning
+try:
+    from pretty_fly_for_an_AI import geometry
+    from pretty_fly_for_an_AI import zobrist as zb
+except ModuleNotFoundError:
+    import geometry
+    import zobrist as zb
 
 BLACK_COLOR = "black"
 WHITE_COLOR = "white"
@@ -100,67 +109,331 @@ def boom(s, i):
             A new State object which is the result of execting the boom on
             this state object.
     """
+    return _clear(s, boom_cleared(s, i))
+
+
+def _clear(s, cleared):
+    """ Returns a copy of s with the board indexes in cleared removed """
     next_board = s.copy()
+    next_board[cleared] = 0
+    return next_board
 
-    to_boom = {i}
-    while to_boom:
-        boom = to_boom.pop()
 
-        # remove piece
-        next_board[boom] = 0
+# ------------------------------ EXPLOSIONS ----------------------------------- #
 
-        # set all token indexes (the non-zero entries of board) in radius to boom
-        radius = boom_radius(boom)
-        to_boom.update(radius[next_board[radius] != 0])
+# the number of occupancy masks whose explosion components are remembered
+COMPONENT_CACHE_SIZE = 4096
 
-    return next_board
 
+def _to_mask(bools):
+    """ Converts a boolean array of length 64 to a 64 bit mask """
+    return int.from_bytes(np.packbits(bools, bitorder="little").tobytes(), "little")
 
-# ------------------------------ END GAME MOVES ----------------------------------- #
 
+def occupancy(s):
+    """ The mask of every occupied board index of s (see geometry.py) """
+    return _to_mask(s != 0)
 
-# Normal Move Ordering ----------------------------- #
-def next_states(s, opponent, avoid=dict()):
-    """ A generator for the states accessible from this state via valid moves.
 
-        Produces the State as well as an identifier for the action taken.
+@functools.lru_cache(maxsize=COMPONENT_CACHE_SIZE)
+def explosion_components(occupied):
+    """ Finds the explosion components of an occupancy mask. An explosion 
+        component is a set of stacks which all explode if any one of them 
+        does: the connected components of the occupied squares where squares 
+        are connected if they are in each others explosion radius.
+
+        Results are cached, since they depend only on which squares are 
+        occupied.
 
         Args:
+            occupied: an occupancy mask (see occupancy)
+
+        Returns:
+            A tuple c where c[i] is None if board index i is not occupied and 
+            otherwise is a tuple (mask, indexes, index_array) describing the 
+            component containing i: its mask, its board indexes as a tuple and 
+            as a numpy array (which must not be modified).
+    """
+    components = [None] * (BOARD_SIZE ** 2)
+
+    remaining = occupied
+    while remaining:
+
+        # grow a component from the lowest remaining occupied square
+        component = remaining & -remaining
+        while True:
+            grown = geometry.neighbourhood(component) & occupied
+            if grown == component:
+                break
+            component = grown
+
+        idxs = geometry.mask_indexes(component)
+        entry = (component, tuple(idxs), np.array(idxs, dtype=np.intp))
+        for i in idxs:
+            components[i] = entry
+
+        remaining &= ~component
+
+    return tuple(components)
+
+
+def boom_mask(s, i):
+    """ Finds the mask of the board indexes cleared by the token at board 
+        index i exploding, including by any chain reaction """
+    return explosion_components(occupancy(s))[i][0]
+
+
+def _booms(s, stacks, opponent):
+    """ Finds the boom actions worth generating: those of stacks with an 
+        opponent stack in their explosion radius.
+
+        Args:
+            s: the board state
+            stacks: the board indexes of the stacks of the player making the 
+            move, in increasing order
             opponent: set to True if the opponent is making the move.
 
+        Returns:
+            A list of the board indexes to boom at.
+    """
+    enemies = _to_mask(s > 0) if opponent else _to_mask(s < 0)
+    return [si for si in stacks if geometry.NEAR_MASKS[si] & enemies]
+
+
+def boom_cleared(s, i):
+    """ Finds the board indexes cleared by the token at board index i 
+        exploding, including by any chain reaction.
+
+        Args:
+            s: the board state
+            i: the board index at which to boom
+
+        Returns:
+            A numpy array of board indexes, which must not be modified.
+    """
+    return explosion_components(occupancy(s))[i][2]
+
+
+# ------------------------------ IN PLACE MOVES ----------------------------------- #
+
+def apply_move(s, num_tokens, si, ei, opponent):
+    """ Applies a move to s in place. The inverse of this is undo.
+
+        No validation is done. May not throw an error if move is invalid.
+
+        Args:
+            s: the board state, which is modified
+            num_tokens: the number of tokens being moved.
+            si: the starting board index of the move
+            ei: the ending board index of the move
+            opponent: set to True if the oponent is making the move
+
+        Returns:
+            An undo record which restores s when passed to undo.
+    """
+    record = ((si, s[si]), (ei, s[ei]))
+
+    # opponent stacks are stored as negative values
+    if opponent:
+        num_tokens = -num_tokens
+
+    s[si] -= num_tokens
+    s[ei] += num_tokens
+    return record
+
+
+def apply_boom(s, i):
+    """ Applies the token at board index i exploding to s in place. The 
+        inverse of this is undo.
+
+        No validation is done. May not throw an error if the move is invalid.
+
+        Args:
+            s: the board state, which is modified
+            i: the board index at which to boom
+
+        Returns:
+            An undo record which restores s (including every stack removed by 
+            the chain reaction) when passed to undo.
+    """
+    return _apply_clear(s, boom_cleared(s, i))
+
+
+def _apply_clear(s, cleared):
+    """ Removes the board indexes in cleared from s in place, returning an undo
+        record """
+    # remember what was removed
+    record = [(j, s[j]) for j in cleared]
+    s[cleared] = 0
+
+    return record
+
+
+def undo(s, record):
+    """ Reverts s in place to the board before the action which produced 
+        record (see apply_move and apply_boom) """
+    for i, h in record:
+        s[i] = h
+
+
+# ------------------------------ ACTIONS ----------------------------------- #
+
+def _next_actions(s, opponent, avoid, positions, tokens):
+    """ Shared implementation of next_actions and next_actions_end.
+
+        Args:
+            s: the board state
+            opponent: set to True if the opponent is making the move.
+            avoid: a container of keys of states which are not to be generated
+            positions: move_positions or move_positions_end
+            tokens: a callable tokens(height) giving the order to try moving
+            tokens in
+
         Yields:
-            tuples of the form (name, state) where name is the identifier
-            of the action and state is the State object resulting from the
-            action.
+            action codes
     """
     # get the indexes of the stacks of the player making the move
-    stacks = np.flatnonzero(s < 0) if opponent else np.flatnonzero(s > 0)
+    stacks = (np.flatnonzero(s < 0) if opponent else np.flatnonzero(s > 0)).tolist()
 
-    # All booms generated first
-    for si in stacks:
+    # the key of s, from which the key of each move is found
+    z = zobrist(s, opponent) if avoid else None
 
-        # Assumes that opponent also wont blow up. If it does, thats fine but dont need to generate the move.
-        if not opponent and any(pos < 0 for pos in s[boom_radius(si)]):
-            yield boom_name(si), boom(s, si)
-
-        if opponent and any(pos > 0 for pos in s[boom_radius(si)]):
-            yield boom_name(si), boom(s, si)
+    # All booms generated first
+    # Assumes that opponent also wont blow up. If it does, thats fine but dont need to generate the move.
+    for si in _booms(s, stacks, opponent):
+        yield boom_code(si)
 
     # All moves generated next
     for si in stacks:
 
-        height = abs(s[si])
+        height = abs(int(s[si]))
 
-        for to_i in move_positions(si, height):
+        for to_i in positions(si, height):
             # checks if to_i is either empty or the same color as si
             if s[to_i] * s[si] >= 0:
-                # Moves generated from moving least first, to moving all last.
 
-                for n in range(1, height + 1):
+                for n in tokens(height):
+
+                    if not avoid or move_key(z, s, n, si, to_i, opponent) not in avoid:
+                        yield move_code(n, si, to_i)
+
+
+def next_actions(s, opponent, avoid=dict()):
+    """ A generator for the valid actions from this state, without creating the
+        resulting states (see apply_action).
+
+        Booms are generated first, then moves from furthest to closest, moving 
+        the least tokens first.
+
+        Args:
+            s: the board state
+            opponent: set to True if the opponent is making the move.
+            avoid: a container of keys (see key) of states not to generate
+
+        Yields:
+            action codes (see move_code and boom_code)
+    """
+    return _next_actions(s, opponent, avoid, move_positions, lambda h: range(1, h + 1))
+
+
+def next_actions_end(s, opponent, avoid=dict()):
+    """ The same as next_actions using the end game move ordering: booms, then 
+        moves to every second distance from furthest to closest, moving the 
+        most tokens first. """
+    return _next_actions(s, opponent, avoid, move_positions_end, lambda h: range(h, 0, -1))
+
+
+def next_booms(s, opponent):
+    """ The action codes of the booms generated by next_actions (and 
+        next_actions_end), i.e. booms of stacks with an opponent stack in their
+        explosion radius.
+
+        Args:
+            s: the board state
+            opponent: set to True if the opponent is making the move.
+    """
+    stacks = (np.flatnonzero(s < 0) if opponent else np.flatnonzero(s > 0)).tolist()
+    return [boom_code(si) for si in _booms(s, stacks, opponent)]
+
+
+def apply_action(s, action, opponent):
+    """ Returns the new state which is the result of an action.
+
+        Args:
+            s: the board state
+            action: an action code
+            opponent: set to True if the opponent is making the move.
+    """
+    num_tokens, si, ei = action >> 12, (action >> 6) & 63, action & 63
+    if num_tokens == 0:
+        return boom(s, si)
+    return move(s, num_tokens, si, ei, opponent)
+
+
+def apply_action_inplace(s, action, opponent):
+    """ Applies an action to s in place, returning an undo record (see undo)
+
+        Args:
+            s: the board state, which is modified
+            action: an action code
+            opponent: set to True if the opponent is making the move.
+    """
+    num_tokens, si, ei = action >> 12, (action >> 6) & 63, action & 63
+    if num_tokens == 0:
+        return apply_boom(s, si)
+    return apply_move(s, num_tokens, si, ei, opponent)
+
+
+def action_key(z, s, action, opponent):
+    """ Finds the key of apply_action(s, action, opponent) from z, the key of s,
+        without creating the new state """
+    num_tokens, si, ei = action >> 12, (action >> 6) & 63, action & 63
+    if num_tokens == 0:
+        return boom_key(z, s, boom_cleared(s, si))
+    return move_key(z, s, num_tokens, si, ei, opponent)
+
+
+def count_actions(s, opponent):
+    """ Counts the actions generated by next_actions, without generating them.
+        This is a cheap measure of mobility.
+
+        Args:
+            s: the board state
+            opponent: set to True if the opponent is making the move.
+    """
+    theirs = _to_mask(s > 0) if opponent else _to_mask(s < 0)
+    stacks = (np.flatnonzero(s < 0) if opponent else np.flatnonzero(s > 0)).tolist()
+
+    count = len(_booms(s, stacks, opponent))
+    for si in stacks:
+        height = abs(int(s[si]))
+
+        # every number of tokens can move to each square without an opponent
+        count += height * bin(geometry.MOVE_MASKS[si][height] & ~theirs).count("1")
+    return count
+
+
+# ------------------------------ END GAME MOVES ----------------------------------- #
+
 
-                    next_state = move(s, n, si, to_i, opponent)
-                    if next_state.tobytes() not in avoid:
-                        yield move_name(n, si, to_i), next_state
+# Normal Move Ordering ----------------------------- #
+def next_states(s, opponent, avoid=dict()):
+    """ A generator for the states accessible from this state via valid moves.
+
+        Produces the State as well as the code of the action taken (see 
+        action_code). The state is only created when the generator is advanced,
+        so states after a cut off are never created.
+
+        Args:
+            opponent: set to True if the opponent is making the move.
+            avoid: a container of keys (see key) of states not to generate
+
+        Yields:
+            tuples of the form (action, state) where action is the action code
+            and state is the State object resulting from the action.
+    """
+    for action in next_actions(s, opponent, avoid):
+        yield action, apply_action(s, action, opponent)
 
 
 def move_positions(stack_i, height):
@@ -171,22 +444,10 @@ def move_positions(stack_i, height):
             height: the height of the stack
 
         Returns:
-            The board indexes which stack_i may move to
+            The board indexes which stack_i may move to, from furthest first to
+            closest last (see geometry.MOVE_RAYS)
     """
-    mp = []
-
-    x0, y0 = itop(stack_i)
-
-    # iterate over move distances
-    # Moves generated from furthest first to closest last
-    for d in range(height, 0, -1):
-
-        if 0 <= y0 - d: mp.append(ptoi(x0, y0 - d))
-        if BOARD_SIZE > y0 + d: mp.append(ptoi(x0, y0 + d))
-        if 0 <= x0 - d: mp.append(ptoi(x0 - d, y0))
-        if BOARD_SIZE > x0 + d: mp.append(ptoi(x0 + d, y0))
-
-    return np.array(mp)
+    return geometry.MOVE_RAYS[stack_i][height]
 
 
 # End game move ordering --------------------------------- #
@@ -198,71 +459,244 @@ def move_positions_end(stack_i, height):
             height: the height of the stack
 
         Returns:
-            The board indexes which stack_i may move to
+            The board indexes which stack_i may move to, taking every second
+            distance from height (see geometry.MOVE_RAYS_END)
     """
-    mp = []
+    return geometry.MOVE_RAYS_END[stack_i][height]
 
-    x0, y0 = itop(stack_i)
 
-    # iterate over move distances
-    # Moves generated from furthest first to closest last
-    for d in range(height, 0, -2):
+def next_states_end(s, opponent, avoid=dict()):
+    """ A generator for the states accessible from this state via valid moves.
 
-        if 0 <= y0 - d: mp.append(ptoi(x0, y0 - d))
-        if BOARD_SIZE > y0 + d: mp.append(ptoi(x0, y0 + d))
-        if 0 <= x0 - d: mp.append(ptoi(x0 - d, y0))
-        if BOARD_SIZE > x0 + d: mp.append(ptoi(x0 + d, y0))
+        Produces the State as well as the code of the action taken (see 
+        action_code).
 
-    return np.array(mp)
+        Args:
+            s: the board state
+            opponent: set to True if the opponent is making the move.
+            avoid: a container of keys (see key) of states not to generate
 
+        Yields:
+            tuples of the form (action, state) where action is the action code
+            and state is the State object resulting from the action.
+    """
+    for action in next_actions_end(s, opponent, avoid):
+        yield action, apply_action(s, action, opponent)
 
-def next_states_end(s, opponent, avoid=dict()):
-    """ A generator for the states accessible from this state via valid moves.
 
-        Produces the State as well as an identifier for the action taken.
+def _next_states_inplace(s, opponent, actions):
+    """ Shared implementation of next_states_inplace and 
+        next_states_end_inplace.
 
         Args:
             s: the board state
             opponent: set to True if the opponent is making the move.
+            actions: an iterable of the action codes to apply
 
         Yields:
-            tuples of the form (name, state) where name is the identifier
-            of the action and state is the State object resulting from the
-            action.
+            tuples of the form (action, s) where s has been modified to be the 
+            result of the action with code action.
     """
+    for action in actions:
+
+        record = apply_action_inplace(s, action, opponent)
+        try:
+            yield action, s
+        finally:
+            undo(s, record)
+
+
+def next_states_inplace(s, opponent, avoid=dict()):
+    """ The same as next_states except that no new states are created. 
+        Instead s is modified to be each next state in turn, and is restored 
+        before the next action is generated and when the generator is closed.
+
+        A yielded state is only valid until the generator is advanced, so it 
+        must be copied if it is to be kept.
+
+        Args:
+            s: the board state
+            opponent: set to True if the opponent is making the move.
+            avoid: a container of keys (see key) of states not to generate
+
+        Yields:
+            tuples of the form (action, s) where action is the action code and
+            s is the board after the action.
+    """
+    return _next_states_inplace(s, opponent, next_actions(s, opponent, avoid))
+
+
+def next_states_end_inplace(s, opponent, avoid=dict()):
+    """ The same as next_states_end except that s is modified in place (see 
+        next_states_inplace). """
+    return _next_states_inplace(s, opponent, next_actions_end(s, opponent, avoid))
+
+
+# ------------------------------ BATCHED MOVES ----------------------------------- #
+
+def _next_states_batch(s, opponent, avoid, move_arrays):
+    """ Shared implementation of next_states_batch and next_states_end_batch.
+
+        Args:
+            s: the board state
+            opponent: set to True if the opponent is making the move.
+            avoid: None or a container of keys of states not to generate
+            move_arrays: geometry.MOVE_ARRAYS or geometry.MOVE_ARRAYS_END
+
+        Returns:
+            A tuple (actions, children) as in next_states_batch
+    """
+    sign = -1 if opponent else 1
+
     # get the indexes of the stacks of the player making the move
-    stacks = np.flatnonzero(s < 0) if opponent else np.flatnonzero(s > 0)
+    stacks = np.flatnonzero(sign * s > 0)
 
-    # All booms generated first
-    for si in stacks:
+    # booms: stacks with an opponent stack in radius. The board is padded 
+    # with an empty entry to allow gathering all radii at once
+    padded = np.append(sign * s, 0)
+    boom_stacks = stacks[(padded[geometry.NEAR_PADDED[stacks]] < 0).any(axis=1)]
 
-        # Assumes that opponent also wont blow up. If it does, thats fine but dont need to generate the move.
-        if not opponent and any(pos < 0 for pos in s[boom_radius(si)]):
-            yield boom_name(si), boom(s, si)
+    # moves: the (end index, num tokens) of every move of every stack, in order
+    heights = sign * s[stacks]
+    per_stack = [move_arrays[si][h] for si, h in zip(stacks.tolist(), heights.tolist())]
+    ends, tokens = np.concatenate(per_stack, axis=1) if per_stack else np.empty((2, 0), dtype=np.intp)
+    starts = np.repeat(stacks, [a.shape[1] for a in per_stack])
 
-        if opponent and any(pos > 0 for pos in s[boom_radius(si)]):
-            yield boom_name(si), boom(s, si)
+    # can move onto an empty square or the players own stacks only
+    valid = sign * s[ends] >= 0
+    starts, ends, tokens = starts[valid], ends[valid], tokens[valid]
 
-    # All moves generated next
-    for si in stacks:
+    num_booms = len(boom_stacks)
+    actions = np.concatenate((
+        boom_code(boom_stacks), move_code(tokens, starts, ends)
+    )).astype(ACTION_DTYPE)
 
-        height = abs(s[si])
+    # scatter the changes of every action into copies of the board
+    children = np.repeat(s[np.newaxis], num_booms + len(starts), axis=0)
 
-        for to_i in move_positions_end(si, height):
-            # checks if to_i is either empty or the same color as si
-            if s[to_i] * s[si] >= 0:
+    if num_booms:
+        components = explosion_components(occupancy(s))
+        cleared = [components[si][2] for si in boom_stacks.tolist()]
+        rows = np.repeat(np.arange(num_booms), [len(c) for c in cleared])
+        children[rows, np.concatenate(cleared)] = 0
+
+    rows = np.arange(num_booms, len(children))
+    signed_tokens = (sign * tokens).astype(np.int8)
+    children[rows, starts] -= signed_tokens
+    children[rows, ends] += signed_tokens
 
-                for n in range(height, 0, -1):
+    if avoid:
+        keys = zobrist_batch(children, not opponent)
+        keep = ~np.isin(keys, np.fromiter(avoid, dtype=np.uint64, count=len(avoid)))
+        actions, children = actions[keep], children[keep]
 
-                    next_state = move(s, n, si, to_i, opponent)
-                    if next_state.tobytes() not in avoid:
-                        yield move_name(n, si, to_i), next_state
+    return actions, children
+
+
+def next_states_batch(s, opponent, avoid=None):
+    """ Finds all states accessible from this state via valid moves at once.
+
+        The actions are the same, and in the same order, as next_states.
+
+        Args:
+            s: the board state
+            opponent: set to True if the opponent is making the move.
+            avoid: (optional) a container of keys (see key) of states not to
+            generate
+
+        Returns:
+            A tuple (actions, children) where actions is an array of action 
+            codes (see move_code and boom_code) and children a 2-D array where
+            children[k] is the board resulting from actions[k].
+    """
+    return _next_states_batch(s, opponent, avoid, geometry.MOVE_ARRAYS)
+
+
+def next_states_end_batch(s, opponent, avoid=None):
+    """ The same as next_states_batch using the end game move ordering (see 
+        next_states_end) """
+    return _next_states_batch(s, opponent, avoid, geometry.MOVE_ARRAYS_END)
+
+
+# ------------------------------ ZOBRIST KEYS ----------------------------------- #
+
+def zobrist(s, opponent=False):
+    """ Computes the Zobrist key of a state (see zobrist.py).
+
+        Args:
+            s: the board state
+            opponent: set to True if it is the opponents turn to move
+
+        Returns:
+            A 64 bit integer
+    """
+    z = zb.SIDE_KEY if opponent else 0
+    for i in np.flatnonzero(s).tolist():
+        z ^= zb.SQUARE_KEYS[i][s[i]]
+    return z
+
+
+def zobrist_batch(boards, opponent=False):
+    """ Computes the Zobrist keys of a 2-D array of boards at once.
+
+        Args:
+            boards: a 2-D array of boards
+            opponent: set to True if it is the opponents turn to move in every
+            board
+
+        Returns:
+            A numpy array of 64 bit unsigned integers
+    """
+    keys = np.bitwise_xor.reduce(zb.SQUARE_KEYS_ARRAY[np.arange(BOARD_SIZE ** 2), boards], axis=1)
+    return keys ^ np.uint64(zb.SIDE_KEY) if opponent else keys
+
+
+def move_key(z, s, num_tokens, si, ei, opponent):
+    """ Finds the key of move(s, num_tokens, si, ei, opponent) from z, the key
+        of s, without creating the new state """
+    # opponent stacks are stored as negative values
+    if opponent:
+        num_tokens = -num_tokens
+
+    hs, he = int(s[si]), int(s[ei])
+    keys_s, keys_e = zb.SQUARE_KEYS[si], zb.SQUARE_KEYS[ei]
+    return z ^ keys_s[hs] ^ keys_s[hs - num_tokens] ^ keys_e[he] ^ keys_e[he + num_tokens] ^ zb.SIDE_KEY
+
+
+def boom_key(z, s, cleared):
+    """ Finds the key of the state resulting from the board indexes in cleared
+        (see boom_cleared) being removed from s, from z, the key of s """
+    for i in cleared:
+        z ^= zb.SQUARE_KEYS[i][s[i]]
+    return z ^ zb.SIDE_KEY
 
 
 def is_gameover(s):
     return np.all(s >= 0) or np.all(s <= 0)
 
 
+def num_stacks(s):
+    """ The number of occupied board indexes """
+    return np.count_nonzero(s)
+
+
+def key(s, opponent=False):
+    """ A hashable identifier of s, used for repeated state checking. This is 
+        the Zobrist key of s (see zobrist)
+
+        Args:
+            s: the board state
+            opponent: set to True if it is the opponents turn to move
+    """
+    return zobrist(s, opponent)
+
+
+def to_array(s):
+    """ Returns s as a board array. Allows code to convert from any board 
+        engine (see bitboard.py) to this representation """
+    return s
+
+
 def create_start_state(color):
     """ Creates the starting baord state.
 
@@ -285,7 +719,7 @@ def ptoi(x, y):
 
 def itop(i):
     """ Converts a board index to a board coordinate """
-    return (i % BOARD_SIZE, i // BOARD_SIZE)
+    return geometry.ITOP[i]
 
 
 def boom_radius(i):
@@ -295,17 +729,10 @@ def boom_radius(i):
             i: a board index
 
         Returns:
-            A numpy array of vaid board indexes in the radius of i (excluding i)
+            A numpy array of vaid board indexes in the radius of i (excluding i).
+            This is shared by all callers and must not be modified.
     """
-    x0, y0 = itop(i)
-
-    poss = [(x0 - 1, y0 - 1), (x0 - 1, y0), (x0 - 1, y0 + 1),
-            (x0, y0 - 1), (x0, y0 + 1),
-            (x0 + 1, y0 - 1), (x0 + 1, y0), (x0 + 1, y0 + 1)]
-
-    return np.array([
-        ptoi(x, y) for x, y in poss if 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE
-    ])
+    return geometry.NEAR_INDEXES[i]
 
 
 def move_name(num_tokens, si, ei):
@@ -319,5 +746,51 @@ def boom_name(i):
     return (BOOM_ACTION, itop(int(i)))
 
 
+# Action codes --------------------------------------------- #
+# Internally actions are encoded in 16 bit integers, which can also be stored in
+# numpy arrays. Identifiers (see move_name and boom_name) are only used to 
+# communicate with the referee. Bits 12-15 hold the number of tokens moved, which is zero for a boom,
+# bits 6-11 the starting board index and bits 0-5 the ending board index (which
+# is the starting index for a boom).
+
+ACTION_DTYPE = np.uint16
+
+
+def move_code(num_tokens, si, ei):
+    """ Gets the action code for a move sending num_tokens from board index si
+        to board index ei. Also works elementwise on numpy arrays. """
+    return (num_tokens << 12) | (si << 6) | ei
+
+
+def boom_code(i):
+    """ Gets the action code for a boom at board index i. Also works 
+        elementwise on numpy arrays. """
+    return (i << 6) | i
+
+
+def action_name(code):
+    """ Converts an action code to the identifier of the action (see move_name
+        and boom_name) """
+    code = int(code)
+    num_tokens, si, ei = code >> 12, (code >> 6) & 63, code & 63
+    if num_tokens == 0:
+        return boom_name(si)
+    return move_name(num_tokens, si, ei)
+
+
+def action_code(action):
+    """ Converts the identifier of an action (see move_name and boom_name), as
+        received from the referee, to an action code """
+    if action[0] == BOOM_ACTION:
+        return boom_code(ptoi(*action[1]))
+    _, num_tokens, sp, ep = action
+    return move_code(num_tokens, ptoi(*sp), ptoi(*ep))
+
+
+def is_boom(code):
+    """ Checks whether an action code is a boom """
+    return code >> 12 == 0
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,312 @@
+""" An endgame tablebase: the exact result of every position with only a few
+    tokens left, found by retrograde analysis.
+
+    Positions are stored from the point of view of the player to move (whose
+    stacks are positive, as in state.py), with the value:
+        WIN - d if the player to move wins d plies from now (with best play)
+        -(WIN - d) if the player to move loses d plies from now
+        0 if the position is drawn
+    Repetition and the turn limit are not taken into account.
+
+    The tablebase is generated offline with
+        python3 -m pretty_fly_for_an_AI.tablebase --tokens 3
+    from the partB directory, and written to TABLEBASE_FILE as a hash table of
+    (Zobrist key, value) entries with linear probing, which is memory mapped
+    at runtime so a lookup only touches a page or two of the file. Only won and
+    lost positions are stored: a position with at most max_tokens tokens which
+    is not in the table is drawn.
+
+    The first entry of the file is a header holding MAGIC and max_tokens.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from pretty_fly_for_an_AI import state as st
+
+TABLEBASE_FILE = "./pretty_fly_for_an_AI/tablebase.bin"
+
+# the default (and largest practical) number of tokens on the board. The
+# memory mapped file counts towards the referee's space limit, and four tokens
+# would need several hundred MB to generate and store
+MAX_TOKENS = 3
+
+# the value of a position in which the player to move has won
+WIN = 1000
+
+# identifies a tablebase file
+MAGIC = 0x54424153452D3031
+
+ENTRY_DTYPE = np.dtype([("key", "<u8"), ("value", "<i2")])
+
+# the number of positions whose actions are expanded at once by generate
+CHUNK = 16384
+
+
+class Tablebase:
+    """ A memory mapped tablebase file.
+
+        Attributes:
+            max_tokens: positions with at most this many tokens are solved
+    """
+
+    def __init__(self, path=TABLEBASE_FILE):
+        records = np.memmap(path, dtype=ENTRY_DTYPE, mode="r")
+        if int(records[0]["key"]) != MAGIC:
+            raise ValueError(f"{path} is not a tablebase file")
+
+        self.max_tokens = int(records[0]["value"])
+        self.keys = records["key"][1:]
+        self.values = records["value"][1:]
+        self._mask = len(self.keys) - 1
+
+    def probe(self, s):
+        """ Looks up a position, with the player to move (positive).
+
+            Returns:
+                The value of s (see the module docstring), or None if s has
+                too many tokens or the game is over.
+        """
+        if int(np.abs(s).sum()) > self.max_tokens or st.is_gameover(s):
+            return None
+
+        key = st.zobrist(s)
+        i = key & self._mask
+        while True:
+            k = int(self.keys[i])
+            if k == key:
+                return int(self.values[i])
+            if k == 0:
+                return 0
+            i = (i + 1) & self._mask
+
+    def score(self, s, opponent):
+        """ The value of s as a score for the searches: above 1 (the bound of
+            evaluation.reward) for a win, preferring shorter wins, below -1
+            for a loss and 0 for a draw.
+
+            Args:
+                s: the board state
+                opponent: set to True if the opponent is making the move
+
+            Returns:
+                The score for the player making the move, or None if s is not
+                in the tablebase.
+        """
+        v = self.probe(-s if opponent else s)
+        if v is None:
+            return None
+        return v / WIN + np.sign(v)
+
+    def best_action(self, s, avoid=()):
+        """ Finds a best action of the player from s, preferring the shortest
+            win, a draw or else the longest loss.
+
+            Args:
+                s: the board state, with the player to move
+                avoid: keys (see state.key) of states not to move to unless
+                every action leads to one
+
+            Returns:
+                An action code, or None if s is not in the tablebase.
+        """
+        if self.probe(s) is None:
+            return None
+
+        for avoiding in (avoid, ()):
+            best = None
+            best_value = None
+            for action in st.next_actions(s, False, avoid=avoiding):
+                child = -st.apply_action(s, action, False)
+
+                v = _terminal_value(child)
+                if v is None:
+                    v = self.probe(child)
+                v = _backup(v)
+
+                if best is None or v > best_value:
+                    best = action
+                    best_value = v
+
+            if best is not None:
+                return best
+        return None
+
+
+def terminal_score(s, opponent):
+    """ The score of s on the scale of Tablebase.score if the game is over (a
+        result at distance 0), otherwise None. Searches using the tablebase
+        score game over states with this, so that losing now is not preferred
+        to a longer loss in the tablebase """
+    v = _terminal_value(-s if opponent else s)
+    if v is None:
+        return None
+    return v / WIN + np.sign(v)
+
+
+def _terminal_value(s):
+    """ The value of s if the game is over, otherwise None """
+    ours = (s > 0).any()
+    theirs = (s < 0).any()
+    if ours and theirs:
+        return None
+    if ours:
+        return WIN
+    if theirs:
+        return -WIN
+    return 0
+
+
+def _backup(v):
+    """ The value of a position from the value v of the position after the
+        action (for the other player). Works on numpy arrays. """
+    return -v + np.sign(v)
+
+
+def configurations(num_tokens):
+    """ Every arrangement of num_tokens tokens of one player.
+
+        Returns:
+            A 2-D array of boards
+    """
+    boards = []
+    board = st.BOARD_EMPTY.copy()
+
+    def place(start, tokens):
+        if tokens == 0:
+            boards.append(board.copy())
+            return
+        for i in range(start, st.BOARD_SIZE ** 2):
+            for h in range(1, tokens + 1):
+                board[i] = h
+                place(i + 1, tokens - h)
+            board[i] = 0
+
+    place(0, num_tokens)
+    return np.array(boards, dtype=np.int8)
+
+
+def positions(max_tokens):
+    """ Every position with at most max_tokens tokens, at least one of each
+        player, with the player to move positive.
+
+        Returns:
+            A 2-D array of boards
+    """
+    configs = {n: configurations(n) for n in range(1, max_tokens)}
+
+    boards = []
+    for ours in range(1, max_tokens):
+        for theirs in range(1, max_tokens - ours + 1):
+            ours_configs = configs[ours]
+            for config in configs[theirs]:
+                disjoint = ~((ours_configs != 0) & (config != 0)).any(axis=1)
+                boards.append(ours_configs[disjoint] - config)
+    return np.concatenate(boards)
+
+
+def generate(max_tokens=MAX_TOKENS, log=print):
+    """ Solves every position with at most max_tokens tokens.
+
+        Every action of every position is expanded once, then the values are
+        found by repeatedly backing up the values of the positions after each
+        action (a win for the other player in d plies is a loss in d + 1, and
+        vice versa) until nothing changes.
+
+        Returns:
+            A tuple (keys, values) of arrays of the Zobrist keys of the
+            positions (see positions) and their values.
+    """
+    boards = positions(max_tokens)
+    keys = st.zobrist_batch(boards)
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    log(f"{len(boards)} positions")
+
+    # the actions of position i are children[offsets[i]:offsets[i + 1]]. Each
+    # is the index of the position after the action, or -1 if the game is
+    # over, in which case its value is in terminal
+    counts = []
+    children = []
+    terminal = []
+    for start in range(0, len(boards), CHUNK):
+        child_boards = []
+        for s in boards[start:start + CHUNK]:
+            n = len(child_boards)
+            for action in st.next_actions(s, False):
+                child_boards.append(-st.apply_action(s, action, False))
+            counts.append(len(child_boards) - n)
+        child_boards = np.array(child_boards)
+
+        ours = (child_boards > 0).any(axis=1)
+        theirs = (child_boards < 0).any(axis=1)
+        over = ~(ours & theirs)
+        terminal.append(np.where(ours, WIN, np.where(theirs, -WIN, 0)))
+
+        index = order[np.searchsorted(sorted_keys, st.zobrist_batch(child_boards))]
+        children.append(np.where(over, -1, index))
+
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    children = np.concatenate(children)
+    terminal = np.concatenate(terminal)
+    inner = children >= 0
+    log(f"{len(children)} actions")
+
+    values = np.zeros(len(boards), dtype=np.int64)
+    for iteration in range(2 * WIN):
+        after = np.where(inner, values[np.where(inner, children, 0)], terminal)
+        backed_up = np.maximum.reduceat(_backup(after), offsets[:-1])
+        if (backed_up == values).all():
+            break
+        values = backed_up
+    log(f"solved in {iteration} iterations")
+
+    return keys, values
+
+
+def write(path, keys, values, max_tokens):
+    """ Writes the won and lost positions to a tablebase file """
+    decisive = values != 0
+    keys = keys[decisive]
+    values = values[decisive]
+
+    # at most half full, so probes are short
+    size = 1 << max(1, (2 * len(keys) - 1).bit_length())
+    mask = size - 1
+
+    records = np.zeros(size + 1, dtype=ENTRY_DTYPE)
+    records[0] = (MAGIC, max_tokens)
+    table = records[1:]
+    for key, value in zip(keys.tolist(), values.tolist()):
+        i = key & mask
+        while table[i]["key"] != 0:
+            i = (i + 1) & mask
+        table[i] = (key, value)
+
+    records.tofile(path)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the endgame tablebase.")
+    parser.add_argument("--tokens", "-n", type=int, default=MAX_TOKENS,
+                        help="Solve positions with at most this many tokens.")
+    parser.add_argument("--output", "-o", default=TABLEBASE_FILE, help="The file to write.")
+    args = parser.parse_args()
+
+    t0 = time.process_time()
+    keys, values = generate(args.tokens)
+    size = write(args.output, keys, values, args.tokens)
+
+    wins = int(np.count_nonzero(values > 0))
+    losses = int(np.count_nonzero(values < 0))
+    longest = WIN - int(np.abs(values[values != 0]).min()) if wins or losses else 0
+    print(f"{wins} won, {losses} lost, {len(values) - wins - losses} drawn, longest {longest} plies")
+    print(f"{size} slots ({(size + 1) * ENTRY_DTYPE.itemsize / 1024 ** 2:.1f}MB) written to {args.output} "
+          f"in {time.process_time() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
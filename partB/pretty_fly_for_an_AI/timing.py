@@ -0,0 +1,77 @@
+""" Time management for the players.
+
+    The referee limits the CPU time (as measured by time.process_time) each
+    player spends in __init__, action and update over the whole game. A
+    TimeManager measures the time used in the same way and divides the time
+    remaining between the moves expected to remain in the game.
+"""
+
+import time
+
+# the referee's CPU time limit for each player, in seconds
+TIME_LIMIT = 60
+
+# time kept in reserve, since the referee also times its own bookkeeping
+# (e.g. garbage collection) and a move can overrun its budget slightly
+TIME_RESERVE = 5
+
+# the referee ends the game as a draw after this many turns per player
+MAX_TURNS = 250
+
+# the expected number of moves remaining is estimated from the number of tokens
+# left on the board, and is never less than MIN_MOVES_LEFT
+MOVES_PER_TOKEN = 3
+MIN_MOVES_LEFT = 10
+
+
+class SearchTimeout(Exception):
+    """ Raised by a search which has used up its time budget """
+
+
+class TimeManager:
+    """ Keeps track of the CPU time used by a player and allocates a time
+        budget to each move.
+
+        Used as a context manager around everything the player does (like the
+        referee's timer), e.g.
+
+            with self.clock:
+                ...
+    """
+
+    def __init__(self, time_limit=TIME_LIMIT, reserve=TIME_RESERVE):
+        self.time_limit = time_limit
+        self.reserve = reserve
+        self.used = 0
+        self.turns = 0
+
+    def __enter__(self):
+        self._start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.used += time.process_time() - self._start
+
+    def remaining(self):
+        """ The CPU time left for the rest of the game, excluding the reserve
+            and the time used so far by the current call """
+        elapsed = time.process_time() - self._start
+        return max(0, self.time_limit - self.reserve - self.used - elapsed)
+
+    def budget(self, num_tokens):
+        """ Allocates a time budget to the next move.
+
+            Args:
+                num_tokens: the total number of tokens on the board
+
+            Returns:
+                The CPU time to spend on the move, in seconds.
+        """
+        turns_left = MAX_TURNS - self.turns
+        moves_left = max(MIN_MOVES_LEFT, min(turns_left, MOVES_PER_TOKEN * num_tokens))
+        return self.remaining() / moves_left
+
+    def deadline(self, num_tokens):
+        """ The value of time.process_time by which the next move should be
+            made (see budget) """
+        return time.process_time() + self.budget(num_tokens)
@@ -0,0 +1,186 @@
+""" A fixed size transposition table for the alpha-beta searches.
+
+    Entries are stored in parallel numpy arrays indexed by the low bits of a
+    states Zobrist key (see state.zobrist), so the table never grows beyond
+    the memory allocated when it is created. Each entry records the full key
+    (to detect collisions), the depth searched, whether the score is exact or
+    a lower/upper bound, the score and the best action code found.
+
+    When two keys map to the same slot the entry from the deeper search is
+    kept, unless the stored entry was written during an earlier search (see
+    TranspositionTable.new_search), in which case it is always replaced.
+
+    A table can be created in shared memory, so that it can be written by a
+    child process (see ponder.py). Entries are written without locking, so 
+    only one process may search it at a time.
+"""
+
+import multiprocessing
+
+import numpy as np
+
+# score bound types
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# stored in place of a missing best move (not a valid action code since at most
+# 12 tokens can be moved)
+NO_MOVE = 0xFFFF
+
+# default memory cap. The referee's space limit is 100MB per player, most of
+# which is needed by python and numpy themselves
+TT_MAX_BYTES = 8 * 1024 ** 2
+
+# the entry arrays of a table, with their types
+ARRAYS = (("keys", np.uint64), ("values", np.float64), ("moves", np.uint16), ("flags", np.int8),
+          ("ages", np.int8), ("depths", np.int8))
+
+# bytes used per entry: key, score, action code, depth, bound type and age
+ENTRY_BYTES = (np.dtype(np.uint64).itemsize + np.dtype(np.float64).itemsize
+               + np.dtype(np.uint16).itemsize + 3 * np.dtype(np.int8).itemsize)
+
+
+class TranspositionTable:
+    """ A transposition table holding at most max_bytes of entries.
+
+        Attributes:
+            size: the number of slots, the largest power of two whose entries
+            fit in max_bytes
+            probes, hits, collisions, stores, overwrites, rejected: counts
+            reported by stats
+    """
+
+    def __init__(self, max_bytes=TT_MAX_BYTES, shared=False):
+        """
+            Args:
+                max_bytes: the memory cap of the entries
+                shared: set to True to allocate the entries in shared memory,
+                so they are shared with child processes the table is passed 
+                to. Statistics and the age are not shared.
+        """
+
+        # use a power of two so the slot is just the low bits of the key
+        self.size = 1 << max(0, (max_bytes // ENTRY_BYTES).bit_length() - 1)
+        self._mask = self.size - 1
+
+        self._buffers = None
+        if shared:
+            self._buffers = {name: multiprocessing.RawArray("b", self.size * np.dtype(dtype).itemsize)
+                             for name, dtype in ARRAYS}
+        self._attach()
+
+        # a depth of -1 marks an empty slot
+        self.depths.fill(-1)
+
+        self.age = 0
+        self.reset_stats()
+
+    def _attach(self):
+        """ Creates the entry arrays, as views of the shared buffers if there 
+            are any """
+        for name, dtype in ARRAYS:
+            if self._buffers is None:
+                setattr(self, name, np.zeros(self.size, dtype=dtype))
+            else:
+                setattr(self, name, np.frombuffer(self._buffers[name], dtype=dtype))
+
+    def __getstate__(self):
+        # only the shared buffers are passed to a child process
+        if self._buffers is None:
+            return self.__dict__
+        return {k: v for k, v in self.__dict__.items() if k not in dict(ARRAYS)}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._buffers is not None:
+            self._attach()
+
+    def probe(self, key):
+        """ Looks up the entry for a state.
+
+            Args:
+                key: the Zobrist key of the state
+
+            Returns:
+                A tuple (depth, flag, value, move) if the state is in the
+                table, otherwise None. move is None if no best move was stored.
+        """
+        self.probes += 1
+        i = key & self._mask
+        depth = int(self.depths[i])
+        if depth < 0:
+            return None
+
+        if int(self.keys[i]) != key:
+            self.collisions += 1
+            return None
+
+        self.hits += 1
+        move = int(self.moves[i])
+        return depth, int(self.flags[i]), float(self.values[i]), None if move == NO_MOVE else move
+
+    def store(self, key, depth, flag, value, move):
+        """ Stores the result of searching a state, subject to the replacement
+            policy.
+
+            Args:
+                key: the Zobrist key of the state
+                depth: the depth the state was searched to
+                flag: EXACT, LOWER or UPPER
+                value: the score of the state
+                move: the best action code found, or None
+        """
+        i = key & self._mask
+        stored_depth = int(self.depths[i])
+
+        if stored_depth >= 0 and int(self.keys[i]) != key:
+            # keep deeper entries from this search
+            if self.ages[i] == self.age and stored_depth > depth:
+                self.rejected += 1
+                return
+            self.overwrites += 1
+
+        self.stores += 1
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.flags[i] = flag
+        self.values[i] = value
+        self.moves[i] = NO_MOVE if move is None else move
+        self.ages[i] = self.age
+
+    def new_search(self):
+        """ Marks the start of a new search. Entries from earlier searches are
+            kept but are always replaced when their slot is needed. """
+        self.age = (self.age + 1) % 128
+
+    def clear(self):
+        """ Removes every entry """
+        self.depths.fill(-1)
+
+    def occupancy(self):
+        """ The fraction of slots which hold an entry """
+        return int(np.count_nonzero(self.depths >= 0)) / self.size
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.rejected = 0
+
+    def stats(self):
+        """ Returns a dictionary of statistics used to size the table """
+        return {
+            "size": self.size,
+            "bytes": self.size * ENTRY_BYTES,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "rejected": self.rejected,
+            "occupancy": self.occupancy(),
+        }
@@ -0,0 +1,41 @@
+""" Zobrist hashing of board states.
+
+    The key of a board is the XOR of one random 64 bit number for every
+    (board index, signed stack height) pair on the board, and another for the
+    side to move. Since XOR is its own inverse the key of a board after an
+    action can be found from the key before it by XORing out the old contents
+    of each changed square and XORing in the new ones.
+
+    The random numbers are generated from a fixed seed so keys are the same
+    between runs (and can be stored in files).
+"""
+
+import random
+
+import numpy as np
+
+#required since this module is imported in different ways when learning
+try:
+    from pretty_fly_for_an_AI.geometry import BOARD_SQUARES, MAX_HEIGHT
+except ModuleNotFoundError:
+    from geometry import BOARD_SQUARES, MAX_HEIGHT
+
+SEED = 30024
+
+_rng = random.Random(SEED)
+
+# SQUARE_KEYS[i][h] is the key of a stack of signed height h at board index i.
+# Each list has 2 * MAX_HEIGHT + 1 entries so that negative heights can be used
+# directly as (python) list indexes. Empty squares have key zero.
+SQUARE_KEYS = tuple(
+    [0] + [_rng.getrandbits(64) for _ in range(2 * MAX_HEIGHT)]
+    for _ in range(BOARD_SQUARES)
+)
+
+# XORed in when it is the opponents turn to move
+SIDE_KEY = _rng.getrandbits(64)
+
+del _rng
+
+# SQUARE_KEYS as a numpy array, for hashing many boards at once
+SQUARE_KEYS_ARRAY = np.array(SQUARE_KEYS, dtype=np.uint64)
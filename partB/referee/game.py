@@ -118,17 +118,27 @@ _BLACK_START_SQUARES = [(0,7), (1,7),   (3,7), (4,7),   (6,7), (7,7),
 _WHITE_START_SQUARES = [(0,1), (1,1),   (3,1), (4,1),   (6,1), (7,1),
                         (0,0), (1,0),   (3,0), (4,0),   (6,0), (7,0)]
 
-def _NEXT_SQUARES(square, d=1):
+def _next_squares(square, d):
     x, y = square
-    return {        (x,y+d),
-            (x-d,y),        (x+d,y),
-                    (x,y-d)        } & _ALL_SQUARES
+    return frozenset({        (x,y+d),
+                      (x-d,y),        (x+d,y),
+                              (x,y-d)        } & _ALL_SQUARES)
 
-def _NEAR_SQUARES(square):
+def _near_squares(square):
     x, y = square
-    return {(x-1,y+1),(x,y+1),(x+1,y+1),
-            (x-1,y),          (x+1,y),
-            (x-1,y-1),(x,y-1),(x+1,y-1)} & _ALL_SQUARES
+    return frozenset({(x-1,y+1),(x,y+1),(x+1,y+1),
+                      (x-1,y),          (x+1,y),
+                      (x-1,y-1),(x,y-1),(x+1,y-1)} & _ALL_SQUARES)
+
+# the square sets are precomputed for every square (and distance)
+_NEXT_SQUARES_TABLE = {sq: tuple(_next_squares(sq, d) for d in range(13)) for sq in _ALL_SQUARES}
+_NEAR_SQUARES_TABLE = {sq: _near_squares(sq) for sq in _ALL_SQUARES}
+
+def _NEXT_SQUARES(square, d=1):
+    return _NEXT_SQUARES_TABLE[square][d]
+
+def _NEAR_SQUARES(square):
+    return _NEAR_SQUARES_TABLE[square]
 
 _MAX_TURNS = 250 # per player
  
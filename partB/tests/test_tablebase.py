@@ -0,0 +1,45 @@
+""" Regression tests for searching with the endgame tablebase.
+
+    Run from the partB directory (the tablebase file path is relative to it)
+    with:
+        python3 -m pytest tests
+"""
+import numpy as np
+
+from pretty_fly_for_an_AI import state as st
+from pretty_fly_for_an_AI import minimax
+from pretty_fly_for_an_AI.evaluation import reward
+from pretty_fly_for_an_AI.ordering import MoveOrdering
+from pretty_fly_for_an_AI.player import LEARNED_WEIGHTS
+from pretty_fly_for_an_AI.tablebase import Tablebase, terminal_score
+from pretty_fly_for_an_AI.transposition import TranspositionTable
+
+
+def _board(ours, theirs):
+    s = st.BOARD_EMPTY.copy()
+    for x, y in ours:
+        s[st.ptoi(x, y)] = 1
+    for x, y in theirs:
+        s[st.ptoi(x, y)] = -1
+    return s
+
+
+def test_terminal_score_is_on_the_tablebase_scale():
+    assert terminal_score(_board([(0, 0)], []), False) == 2
+    assert terminal_score(_board([(0, 0)], []), True) == -2
+    assert terminal_score(st.BOARD_EMPTY.copy(), False) == 0
+    assert terminal_score(_board([(0, 0)], [(7, 7)]), False) is None
+
+
+def test_search_does_not_prefer_losing_now_to_a_longer_loss():
+    # every line loses, and BOOM (4, 7) loses at once
+    s = _board([(4, 7), (5, 7)], [(5, 6), (0, 5), (3, 0)])
+    weights = np.load(LEARNED_WEIGHTS)
+    ev = lambda b: reward(b, weights)
+    tablebase = Tablebase()
+
+    for quiesce in (False, True):
+        for depth in range(1, 5):
+            move = minimax.alpha_beta_search_tt(s, depth, ev, set(), TranspositionTable(), MoveOrdering(),
+                                                quiesce=quiesce, tablebase=tablebase)
+            assert move != st.boom_code(st.ptoi(4, 7))